@@ -0,0 +1,304 @@
+"""
+Download backends
+- SubprocessBackend starts one yt-dlp process per video and parses its output (the default)
+- YtDlpApiBackend runs yt-dlp's Python API in a pool of reusable worker processes, so the
+  interpreter start and the yt-dlp import are paid once per worker instead of once per video,
+  and progress comes from progress hooks instead of parsed text
+- Both take the same arguments and report through the same callbacks, the engine picks one per sync
+"""
+
+import os
+import signal
+import logging
+import threading
+import subprocess
+import multiprocessing
+from metrics import RETRY_MARKER
+from progress import ProgressEvent, parse_progress_line
+
+BACKEND_SUBPROCESS = "subprocess"
+BACKEND_API = "api"
+BACKENDS = (BACKEND_SUBPROCESS, BACKEND_API)
+# Minimum seconds between two "downloading" events a worker sends for the same video
+API_PROGRESS_INTERVAL = 0.2
+
+def ytdlp_api_available():
+    """Return True if the yt_dlp package can be imported by the worker processes"""
+    import importlib.util
+    return importlib.util.find_spec("yt_dlp") is not None
+
+class SubprocessBackend:
+    """Runs every download as its own yt-dlp process, supervised by the engine"""
+
+    name = BACKEND_SUBPROCESS
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def version(self):
+        try:
+            result = subprocess.run([self.engine.executable, "--version"], capture_output=True, text=True)
+        except OSError:
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def download(self, video_id, download_path, cookie_args, options, rate_limit, on_start, on_progress, on_output,
+                 fragments=None):
+        """Download one video and return (exit code, [(upload_date, file_path) of every file written])"""
+        # Imported here, engine imports this module
+        from engine import DONE_MARKER, START_MARKER, build_video_command, splits_streams
+
+        cmd = build_video_command(video_id, download_path, cookie_args, options, self.engine.executable,
+                                  rate_limit=rate_limit, split_streams=splits_streams(options),
+                                  fragments=fragments)
+        process = self.engine._start_process(cmd, stderr=subprocess.STDOUT)
+
+        # Read output in real-time
+        done_files = []
+        try:
+            for line in process.stdout:
+                line = line.strip()
+                if line.startswith(DONE_MARKER + "\t"):
+                    # Once per file, the streams of a split download are reported separately
+                    done_files.append(tuple(line.split("\t", 3)[2:]))
+                    continue
+                if line.startswith(START_MARKER + "\t"):
+                    on_start(line.split("\t", 2)[2])
+                    continue
+
+                event = parse_progress_line(line)
+                if event:
+                    on_progress(event._replace(video_id=video_id))
+                elif line:
+                    on_output(line)
+
+            # Wait for process to complete
+            process.wait()
+        finally:
+            self.engine._forget_process(process)
+        return process.returncode, done_files
+
+    def shutdown(self, timeout):
+        # The engine terminates its own processes
+        pass
+
+# Worker process state, set by _init_worker
+_events = None
+_stop = None
+
+def _init_worker(events, stop):
+    global _events, _stop
+    # Ctrl+C reaches the whole process group; the parent stops the workers through the stop event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _events = events
+    _stop = stop
+
+def _ydl_params(video_id, download_path, cookie_file, options, rate_limit, fragments=None):
+    """Translate the download options into YoutubeDL parameters, mirroring build_video_command"""
+    from engine import (OUTPUT_TEMPLATE, BEST_QUALITY_FORMAT, SPLIT_OUTPUT_TEMPLATE, SPLIT_QUALITY_FORMAT,
+                        splits_streams)
+
+    split_streams = splits_streams(options)
+    outtmpl = os.path.join(download_path, OUTPUT_TEMPLATE)
+    if split_streams:
+        # Side files keep the plain name, only the streams carry the format ID
+        outtmpl = {"default": os.path.join(download_path, SPLIT_OUTPUT_TEMPLATE),
+                   "thumbnail": outtmpl, "description": outtmpl, "subtitle": outtmpl, "infojson": outtmpl}
+    params = {
+        "outtmpl": outtmpl,
+        "noplaylist": True,
+        "continuedl": True,
+        "overwrites": False,
+        "quiet": True,
+        "noprogress": True,
+    }
+    if rate_limit:
+        params["ratelimit"] = int(rate_limit)
+    if fragments:
+        params["concurrent_fragment_downloads"] = int(fragments)
+    if cookie_file:
+        params["cookiefile"] = cookie_file
+    if options["thumbnails"]:
+        params["writethumbnail"] = True
+    if options["descriptions"]:
+        params["writedescription"] = True
+    if options["subtitles"]:
+        params["writesubtitles"] = True
+        params["subtitleslangs"] = ["en"]
+    if options.get("info_json", True):
+        params["writeinfojson"] = True
+    if options["best_quality"]:
+        params["format"] = SPLIT_QUALITY_FORMAT if split_streams else BEST_QUALITY_FORMAT
+    return params
+
+def _run_in_worker(video_id, url, params):
+    """Download one video inside a pool worker; events go back to the parent through the queue"""
+    import time
+    # The first task of every worker pays for this import, later ones reuse it
+    import yt_dlp
+    from yt_dlp.postprocessor.common import PostProcessor
+    from yt_dlp.utils import DownloadCancelled, DownloadError
+
+    def send(kind, payload):
+        _events.put((video_id, kind, payload))
+
+    class Logger:
+        # --print implies --quiet in the subprocess backend, keep the same noise level
+        def debug(self, message):
+            # Screen output ends up here, retries are counted by the run metrics
+            if RETRY_MARKER in message:
+                send("output", message)
+
+        def info(self, message):
+            pass
+
+        def warning(self, message):
+            send("output", message)
+
+        def error(self, message):
+            send("output", message)
+
+    class ReportPP(PostProcessor):
+        """Stands in for the before_dl/after_move --print templates"""
+
+        def __init__(self, kind):
+            super().__init__()
+            self.kind = kind
+
+        def run(self, info):
+            if self.kind == "start":
+                send("start", info.get("filename") or info.get("_filename"))
+            else:
+                result["done"].append((str(info.get("upload_date") or "NA"), info.get("filepath")))
+            return [], info
+
+    last_sent = [0.0]
+
+    def progress_hook(d):
+        if _stop.is_set():
+            # Leaves the .part files for the next sync, like terminating the subprocess does
+            raise DownloadCancelled("The download engine is shutting down")
+        status = d.get("status")
+        now = time.time()
+        if status == "downloading" and now - last_sent[0] < API_PROGRESS_INTERVAL:
+            return
+        last_sent[0] = now
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        send("progress", ProgressEvent(
+            video_id=video_id,
+            status=status or "downloading",
+            downloaded_bytes=int(d.get("downloaded_bytes") or 0),
+            total_bytes=int(total) if total else None,
+            speed=float(d["speed"]) if d.get("speed") else None,
+            eta=int(d["eta"]) if d.get("eta") is not None else None,
+        ))
+
+    result = {"done": []}
+    params = dict(params, logger=Logger(), progress_hooks=[progress_hook])
+    try:
+        with yt_dlp.YoutubeDL(params) as ydl:
+            ydl.add_post_processor(ReportPP("start"), when="before_dl")
+            ydl.add_post_processor(ReportPP("done"), when="after_move")
+            returncode = ydl.download([url])
+    except DownloadCancelled:
+        returncode = 1
+    except DownloadError:
+        # Already reported through the logger
+        returncode = 1
+    finally:
+        # Tells the parent every event of this task has been queued
+        send("end", None)
+    return returncode, result["done"]
+
+class YtDlpApiBackend:
+    """Runs downloads through yt-dlp's Python API in reusable worker processes"""
+
+    name = BACKEND_API
+
+    def __init__(self, processes):
+        self.processes = processes
+        # Worker processes are spawned, forking a process with Tk and worker threads isn't safe
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._pool = None
+        self._events = None
+        self._stop = None
+        self._handlers = {}
+        self._dispatcher = None
+
+    def version(self):
+        try:
+            from yt_dlp.version import __version__
+        except ImportError:
+            return None
+        return __version__
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._events = self._context.Queue()
+                self._stop = self._context.Event()
+                self._pool = self._context.Pool(self.processes, initializer=_init_worker,
+                                                 initargs=(self._events, self._stop))
+                self._dispatcher = threading.Thread(target=self._dispatch_events, daemon=True)
+                self._dispatcher.start()
+            return self._pool
+
+    def _dispatch_events(self):
+        """Route the events of every worker to the callbacks of the download they belong to"""
+        events = self._events
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            video_id, kind, payload = item
+            handlers = self._handlers.get(video_id)
+            if not handlers:
+                continue
+            try:
+                handlers[kind](payload)
+            except Exception as e:
+                # This thread serves every download of the pool, one bad callback must not stop it
+                logging.error(f"[{video_id}] Error handling {kind} event: {e}")
+
+    def download(self, video_id, download_path, cookie_args, options, rate_limit, on_start, on_progress, on_output,
+                 fragments=None):
+        """Download one video and return (exit code, [(upload_date, file_path) of every file written])"""
+        from engine import VIDEO_URL_TEMPLATE
+
+        cookie_file = cookie_args[1] if len(cookie_args) > 1 else None
+        params = _ydl_params(video_id, download_path, cookie_file, options, rate_limit, fragments)
+        pool = self._ensure_pool()
+
+        ended = threading.Event()
+        self._handlers[video_id] = {"start": on_start, "progress": on_progress, "output": on_output,
+                                    "end": lambda payload: ended.set()}
+        try:
+            result = pool.apply_async(_run_in_worker, (video_id, VIDEO_URL_TEMPLATE.format(video_id), params))
+            # A terminated pool never delivers the result, so don't block on it forever
+            while not result.ready():
+                if self._pool is not pool:
+                    result.wait(1)
+                    if not result.ready():
+                        return None, []
+                result.wait(0.5)
+            # The result can overtake the last events, which travel through the event queue
+            ended.wait(1)
+            return result.get()
+        finally:
+            self._handlers.pop(video_id, None)
+
+    def shutdown(self, timeout):
+        """Cancel the running downloads at their next progress hook, then stop the workers"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        self._stop.set()
+        pool.close()
+        worker_exit = threading.Thread(target=pool.join, daemon=True)
+        worker_exit.start()
+        worker_exit.join(timeout)
+        if worker_exit.is_alive():
+            pool.terminate()
+        self._events.put(None)
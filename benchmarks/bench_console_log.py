@@ -0,0 +1,92 @@
+"""
+Console log benchmark
+- Floods YouTubeDownloader.log() from a worker thread at a fixed line rate
+- Measures how late UI callbacks run while the console is being fed
+- Needs a display (run under xvfb-run on headless machines)
+
+Usage: python benchmarks/bench_console_log.py [--rate 10000] [--seconds 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gui import YouTubeDownloader
+
+PROBE_INTERVAL = 0.02
+
+def flood(app, rate, seconds, stop_event):
+    """Call app.log() at `rate` lines per second for `seconds`"""
+    batch = max(rate // 100, 1)
+    started = time.perf_counter()
+    sent = 0
+    while not stop_event.is_set():
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            break
+        target = int(elapsed * rate)
+        while sent < target:
+            for _ in range(batch):
+                app.log(f"[download]  {sent % 100:5.1f}% of ~  12.34MiB at    2.50MiB/s ETA 00:05 (frag {sent})")
+                sent += 1
+        time.sleep(0.001)
+    return sent
+
+def probe(app, seconds, latencies, stop_event):
+    """Post callbacks from a worker thread and record how long they wait for the UI thread"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline and not stop_event.is_set():
+        posted = time.perf_counter()
+        app.root.after(0, lambda p=posted: latencies.append(time.perf_counter() - p))
+        time.sleep(PROBE_INTERVAL)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=int, default=10000, help="log lines per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of the flood")
+    args = parser.parse_args()
+
+    app = YouTubeDownloader()
+    app.root.withdraw()
+
+    latencies = []
+    stop_event = threading.Event()
+    result = {}
+    flooder = threading.Thread(target=lambda: result.setdefault("sent", flood(app, args.rate, args.seconds, stop_event)), daemon=True)
+    prober = threading.Thread(target=probe, args=(app, args.seconds, latencies, stop_event), daemon=True)
+
+    def finish():
+        if flooder.is_alive() or prober.is_alive():
+            app.root.after(100, finish)
+            return
+        # Let the last flush and the pending probes run before stopping
+        app.root.after(500, app.root.quit)
+
+    started = time.perf_counter()
+    flooder.start()
+    prober.start()
+    app.root.after(100, finish)
+    app.root.mainloop()
+    stop_event.set()
+    wall = time.perf_counter() - started
+
+    lines = int(app.console_text.index("end-1c").split(".")[0])
+    print(f"lines logged:        {result.get('sent', 0)} in {wall:.2f}s")
+    print(f"console lines kept:  {lines} (limit {app.console_max_lines})")
+    if latencies:
+        print(f"callback latency:    p50 {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms "
+              f"({len(latencies)} probes)")
+    app.root.destroy()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+End-to-end pipeline benchmark, fully offline
+- Puts benchmarks/fake_ytdlp.py on PATH as `yt-dlp` and runs everything in a throw-away HOME,
+  so the real index, cookies and listing cache are never touched
+- progress parsing: parse_progress_line throughput on rendered template lines
+- engine: a headless channel sync through DownloadEngine, output lines processed per second
+- library scan: cold and warm LibraryScanner.scan over N dummy files
+- gui: YouTubeDownloader._download_process with log() and show_downloaded_videos, measuring
+  UI callback latency, console backlog and the time until the video table is filled
+  (needs a display, run under xvfb-run on headless machines; skipped otherwise)
+
+Usage: python benchmarks/bench_pipeline.py [--videos 50] [--progress-lines 200] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_YTDLP = os.path.join(REPO_DIR, "benchmarks", "fake_ytdlp.py")
+PROBE_INTERVAL = 0.02
+# Gives up on a GUI run that doesn't finish, e.g. because a dialog is waiting for input
+GUI_TIMEOUT = 600
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def setup_environment(work_dir, args):
+    """Point HOME, PATH and the fake yt-dlp settings at the work directory"""
+    home = os.path.join(work_dir, "home")
+    bin_dir = os.path.join(work_dir, "bin")
+    os.makedirs(home)
+    os.makedirs(bin_dir)
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+
+    if os.name == "nt":
+        with open(os.path.join(bin_dir, "yt-dlp.cmd"), "w") as f:
+            f.write(f'@"{sys.executable}" "{FAKE_YTDLP}" %*\n')
+    else:
+        wrapper = os.path.join(bin_dir, "yt-dlp")
+        with open(wrapper, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_YTDLP}" "$@"\n')
+        os.chmod(wrapper, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+    os.environ.update({
+        "FAKE_YTDLP_VIDEOS": str(args.videos),
+        "FAKE_YTDLP_PROGRESS_LINES": str(args.progress_lines),
+        "FAKE_YTDLP_LINE_RATE": str(args.line_rate),
+        "FAKE_YTDLP_LOG_LINES": str(args.log_lines),
+        "FAKE_YTDLP_ERROR_RATE": str(args.error_rate),
+        "FAKE_YTDLP_SIZE": str(args.size),
+    })
+    # Anything written to a relative path ends up in the work directory
+    os.chdir(work_dir)
+    sys.path.insert(0, REPO_DIR)
+
+def count_output_lines(stats_path):
+    """Sum the lines the fake yt-dlp runs reported, then start over"""
+    try:
+        with open(stats_path) as f:
+            total = sum(int(line) for line in f if line.strip())
+    except OSError:
+        return 0
+    os.remove(stats_path)
+    return total
+
+def bench_parse(lines):
+    """Time parse_progress_line on lines rendered from the real progress template"""
+    from progress import PROGRESS_TEMPLATE, parse_progress_line
+    sys.path.insert(0, os.path.dirname(FAKE_YTDLP))
+    from fake_ytdlp import render, split_print
+
+    template = split_print(PROGRESS_TEMPLATE)[1]
+    samples = [
+        render(template, {"info": {"id": "bench000001"}, "progress": {
+            "status": "downloading", "downloaded_bytes": i * 4096, "total_bytes": 1 << 30,
+            "total_bytes_estimate": None, "speed": 2.5e6 + i, "eta": 100 - i % 100}})
+        for i in range(1000)
+    ]
+    started = time.perf_counter()
+    parsed = 0
+    for i in range(lines):
+        if parse_progress_line(samples[i % len(samples)]):
+            parsed += 1
+    elapsed = time.perf_counter() - started
+    return {"lines": lines, "parsed": parsed, "seconds": elapsed, "lines_per_sec": lines / elapsed}
+
+def engine_options(download_path, args):
+    from engine import DEFAULT_OPTIONS
+    options = dict(DEFAULT_OPTIONS)
+    options.update({
+        "download_path": download_path,
+        "workers": args.workers,
+        "use_cookies": False,
+        "listing_ttl": 0,
+    })
+    return options
+
+def bench_engine(work_dir, args):
+    """Sync one fake channel through the engine without any UI"""
+    from download_index import DownloadIndex
+    from engine import DownloadEngine
+
+    stats_path = os.path.join(work_dir, "engine.stats")
+    os.environ["FAKE_YTDLP_STATS"] = stats_path
+    logged = [0]
+
+    def log(message, level="info"):
+        logged[0] += 1
+
+    index = DownloadIndex(os.path.join(work_dir, "engine-index.db"))
+    engine = DownloadEngine(index, cookie_path=None, log=log)
+    engine.controller.configure(workers=args.workers)
+    options = engine_options(os.path.join(work_dir, "engine-downloads"), args)
+
+    started = time.perf_counter()
+    summary = engine.sync_channel("https://www.youtube.com/@bench-engine/videos", options)
+    wall = time.perf_counter() - started
+    engine.shutdown()
+    index.close()
+
+    lines = count_output_lines(stats_path)
+    return {
+        "videos": summary["total"],
+        "completed": summary["completed"],
+        "failed": summary["failed"],
+        "output_lines": lines,
+        "log_calls": logged[0],
+        "wall_seconds": wall,
+        "lines_per_sec": lines / wall if wall else 0.0,
+    }
+
+def bench_scan(work_dir, files, per_dir=100):
+    """Time a cold and a warm LibraryScanner.scan over `files` dummy videos"""
+    from library import LibraryScanner
+
+    root = os.path.join(work_dir, "library")
+    for i in range(files):
+        folder = os.path.join(root, f"Channel {i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.makedirs(folder)
+        open(os.path.join(folder, f"2024-01-01 - Video {i}.mp4"), "wb").close()
+
+    scanner = LibraryScanner()
+    started = time.perf_counter()
+    added, _, _ = scanner.scan(root)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    scanner.scan(root)
+    warm = time.perf_counter() - started
+    return {"files": files, "found": len(added), "cold_seconds": cold, "warm_seconds": warm}
+
+def bench_gui(work_dir, args):
+    """Drive _download_process and show_downloaded_videos of a hidden main window"""
+    from library import VIDEO_EXTENSIONS
+    from log_pipeline import setup_logging
+    try:
+        import tkinter
+        import gui
+        app = gui.YouTubeDownloader()
+    except (ImportError, tkinter.TclError) as e:
+        return {"skipped": f"no display or tkinter ({e})"}
+    app.root.withdraw()
+    # Logging as gui.main() sets it up, without the console so the flood of progress lines
+    # stays out of the terminal; the log file still gets them through the writer thread
+    log_pipeline = setup_logging(os.path.join(work_dir, "youtube_downloader.log"), console=False)
+
+    stats_path = os.path.join(work_dir, "gui.stats")
+    os.environ["FAKE_YTDLP_STATS"] = stats_path
+    download_path = os.path.join(work_dir, "gui-downloads")
+    options = engine_options(download_path, args)
+
+    latencies = []
+    backlog = []
+    result = {}
+    done = threading.Event()
+
+    def download():
+        started = time.perf_counter()
+        app._download_process("https://www.youtube.com/@bench-gui/videos", options)
+        result["download_seconds"] = time.perf_counter() - started
+        result["download_done_at"] = time.perf_counter()
+        done.set()
+
+    def probe():
+        while not done.is_set():
+            posted = time.perf_counter()
+            app.root.after(0, lambda p=posted: latencies.append(time.perf_counter() - p))
+            backlog.append(len(app._log_buffer))
+            time.sleep(PROBE_INTERVAL)
+
+    def wait_for_table():
+        # _download_process schedules show_downloaded_videos once the sync is done
+        if done.is_set() and "expected_rows" not in result:
+            result["expected_rows"] = sum(
+                1 for _, _, names in os.walk(download_path) for name in names if name.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        if not done.is_set() or app._library_total < result["expected_rows"]:
+            if time.perf_counter() - started > GUI_TIMEOUT:
+                result["timeout"] = True
+                app.root.quit()
+                return
+            app.root.after(5, wait_for_table)
+            return
+        result["table_seconds"] = time.perf_counter() - result["download_done_at"]
+        app.root.after(200, app.root.quit)
+
+    started = time.perf_counter()
+    threading.Thread(target=download, daemon=True).start()
+    threading.Thread(target=probe, daemon=True).start()
+    app.root.after(5, wait_for_table)
+    try:
+        app.root.mainloop()
+        wall = time.perf_counter() - started
+        app.engine.shutdown()
+        app.root.destroy()
+    finally:
+        log_pipeline.stop()
+
+    lines = count_output_lines(stats_path)
+    report = {
+        "output_lines": lines,
+        "download_seconds": result.get("download_seconds"),
+        "lines_per_sec": lines / result["download_seconds"] if result.get("download_seconds") else 0.0,
+        "table_rows": result.get("expected_rows"),
+        "table_seconds": result.get("table_seconds"),
+        "wall_seconds": wall,
+        "max_console_backlog": max(backlog, default=0),
+        "timeout": result.get("timeout", False),
+    }
+    if latencies:
+        report.update({
+            "callback_p50_ms": statistics.median(latencies) * 1000,
+            "callback_p95_ms": percentile(latencies, 0.95) * 1000,
+            "callback_max_ms": max(latencies) * 1000,
+        })
+    return report
+
+def print_report(results):
+    parse = results["parse"]
+    print(f"progress parsing:  {parse['lines_per_sec']:,.0f} lines/s ({parse['lines']} lines)")
+
+    engine = results["engine"]
+    print(f"engine sync:       {engine['videos']} videos ({engine['failed']} failed) in {engine['wall_seconds']:.2f}s, "
+          f"{engine['output_lines']} lines, {engine['lines_per_sec']:,.0f} lines/s")
+
+    scan = results["scan"]
+    print(f"library scan:      {scan['files']} files, cold {scan['cold_seconds'] * 1000:.1f} ms, "
+          f"warm {scan['warm_seconds'] * 1000:.1f} ms")
+
+    gui = results["gui"]
+    if "skipped" in gui:
+        print(f"gui:               skipped, {gui['skipped']}")
+        return
+    print(f"gui download:      {gui['download_seconds'] or 0:.2f}s, {gui['output_lines']} lines, "
+          f"{gui['lines_per_sec']:,.0f} lines/s{' (timed out)' if gui['timeout'] else ''}")
+    if "callback_p50_ms" in gui:
+        print(f"ui callbacks:      p50 {gui['callback_p50_ms']:.1f} ms, p95 {gui['callback_p95_ms']:.1f} ms, "
+              f"max {gui['callback_max_ms']:.1f} ms, console backlog up to {gui['max_console_backlog']} lines")
+    if gui["table_seconds"] is not None:
+        print(f"video table:       {gui['table_rows']} rows {gui['table_seconds'] * 1000:.0f} ms after the sync")
+    print(f"gui wall time:     {gui['wall_seconds']:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=50, help="videos in the fake channel")
+    parser.add_argument("--progress-lines", type=int, default=200, help="progress lines per video")
+    parser.add_argument("--line-rate", type=float, default=0, help="output lines/s per video (0 = unthrottled)")
+    parser.add_argument("--log-lines", type=int, default=5, help="non-progress lines per video")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="fraction of videos that fail")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="bytes of dummy media per video")
+    parser.add_argument("--workers", type=int, default=4, help="parallel downloads")
+    parser.add_argument("--parse-lines", type=int, default=200000, help="lines for the parsing benchmark")
+    parser.add_argument("--scan-files", type=int, default=10000, help="dummy files for the scan benchmark")
+    parser.add_argument("--no-gui", action="store_true", help="skip the GUI benchmark")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON, for comparing runs")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="yt-bench-")
+    cwd = os.getcwd()
+    try:
+        setup_environment(work_dir, args)
+        results = {
+            "parse": bench_parse(args.parse_lines),
+            "engine": bench_engine(work_dir, args),
+            "scan": bench_scan(work_dir, args.scan_files),
+            "gui": {"skipped": "--no-gui"} if args.no_gui else bench_gui(work_dir, args),
+        }
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"work directory: {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+if __name__ == "__main__":
+    main()
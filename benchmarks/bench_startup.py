@@ -0,0 +1,107 @@
+"""
+Startup benchmark
+- Measures how long `import gui` takes in a fresh interpreter
+- Measures time-to-first-frame: from interpreter start until the main window is mapped
+- Reports whether selenium was imported before the first frame
+- The first-frame run needs a display (run under xvfb-run on headless machines)
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--importtime]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import gui
+print(json.dumps({"import": time.perf_counter() - started, "selenium": "selenium" in sys.modules}))
+"""
+
+FIRST_FRAME_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import gui
+imported = time.perf_counter()
+downloader = gui.YouTubeDownloader()
+result = {}
+
+def on_map(event):
+    if event.widget is downloader.root and "frame" not in result:
+        # Wait until the mapped window has been drawn once
+        downloader.root.update_idletasks()
+        result["frame"] = time.perf_counter() - started
+        result["selenium"] = "selenium" in sys.modules
+        downloader.root.after(0, downloader.root.quit)
+
+downloader.root.bind("<Map>", on_map)
+downloader.root.mainloop()
+result["import"] = imported - started
+print(json.dumps(result))
+"""
+
+def run_probe(code):
+    """Run a probe in a fresh interpreter and return its JSON result"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def report(name, values):
+    print(f"{name:<16} median {statistics.median(values) * 1000:7.1f} ms, "
+          f"min {min(values) * 1000:7.1f} ms, max {max(values) * 1000:7.1f} ms")
+
+def show_importtime(limit=15):
+    """Print the slowest modules imported by `import gui`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import gui"],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # import time: self [us] | cumulative | imported package
+        _, cumulative_us, name = line.split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    print("\nslowest imports (cumulative):")
+    for cumulative_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports")
+    args = parser.parse_args()
+
+    imports = [run_probe(IMPORT_PROBE) for _ in range(args.runs)]
+    report("import gui", [run["import"] for run in imports])
+    print(f"{'selenium loaded':<16} {any(run['selenium'] for run in imports)}")
+
+    try:
+        frames = [run_probe(FIRST_FRAME_PROBE) for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"first frame      skipped ({e})")
+    else:
+        report("first frame", [run["frame"] for run in frames])
+        print(f"{'selenium @frame':<16} {any(run['selenium'] for run in frames)}")
+
+    if args.importtime:
+        show_importtime()
+
+if __name__ == "__main__":
+    main()
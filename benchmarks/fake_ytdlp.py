@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Fake yt-dlp for offline benchmarks
+- Understands the subset of yt-dlp arguments the download engine uses: --version, flat channel
+  listings with --print/--playlist-start/--playlist-end, single video downloads with -o, --print
+  before_dl:/after_move: templates and --progress-template, and --skip-download metadata runs
+- Typed output templates (-o thumbnail:...) and split formats like "(bestvideo,bestaudio)", which are
+  downloaded as one file per stream
+- Renders the engine's output templates the way yt-dlp does, so the real parsing code is exercised
+- Writes dummy media, thumbnail, description and info JSON files
+
+Behaviour is configured through environment variables:
+  FAKE_YTDLP_VIDEOS          videos in every channel listing (default 50)
+  FAKE_YTDLP_PROGRESS_LINES  progress lines per video (default 100)
+  FAKE_YTDLP_LINE_RATE       output lines per second per video, 0 = as fast as possible (default 0)
+  FAKE_YTDLP_LOG_LINES       extra non-progress lines per video, printed as warnings (default 0)
+  FAKE_YTDLP_ERROR_RATE      fraction of videos that fail half way, 0..1 (default 0)
+  FAKE_YTDLP_SIZE            bytes of dummy media per video (default 1048576)
+  FAKE_YTDLP_STATS           file that gets one "<lines printed>" line per run (optional)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import datetime
+
+VERSION = "2099.01.01-fake"
+TEMPLATE_FIELD = re.compile(r"%\((?P<key>[^)>]+)(?:>(?P<fmt>[^)]+))?\)(?P<conv>[sdj])")
+# Options that take a value, everything else starting with - is a flag
+WITH_VALUE = {"-o", "--print", "--progress-template", "--playlist-start", "--playlist-end", "--cookies",
+              "--limit-rate", "-f", "--sub-lang", "--concurrent-fragments", "-N"}
+OUTPUT_TYPE = re.compile(r"^(?:subtitle|thumbnail|description|annotation|infojson|link|pl_thumbnail|pl_description|pl_infojson|chapter|pl_video):")
+# Format IDs of the video and audio stream of a split format
+SPLIT_FORMATS = ("137", "140")
+STAGE_PREFIX = re.compile(r"^(?:video|pre_process|after_filter|before_dl|post_process|after_move|after_video|playlist|download):")
+
+def env_number(name, default, kind=int):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+VIDEOS = env_number("FAKE_YTDLP_VIDEOS", 50)
+PROGRESS_LINES = max(env_number("FAKE_YTDLP_PROGRESS_LINES", 100), 1)
+LINE_RATE = env_number("FAKE_YTDLP_LINE_RATE", 0.0, float)
+LOG_LINES = env_number("FAKE_YTDLP_LOG_LINES", 0)
+ERROR_RATE = env_number("FAKE_YTDLP_ERROR_RATE", 0.0, float)
+SIZE = env_number("FAKE_YTDLP_SIZE", 1024 * 1024)
+
+class Output:
+    """stdout with a line counter and the configured line rate"""
+
+    def __init__(self):
+        self.lines = 0
+        self.started = time.perf_counter()
+
+    def print(self, text):
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
+        self.lines += 1
+        if LINE_RATE > 0:
+            delay = self.started + self.lines / LINE_RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        stats_path = os.environ.get("FAKE_YTDLP_STATS")
+        if stats_path:
+            with open(stats_path, "a") as f:
+                f.write(f"{self.lines}\n")
+
+def video_id(position):
+    # 11 characters like a real YouTube ID, position 1 is the newest upload
+    return f"bench{VIDEOS - position:06d}"
+
+def video_info(vid):
+    number = int(vid[5:]) if vid[5:].isdigit() else zlib.crc32(vid.encode()) % 100000
+    upload = datetime.date(2024, 1, 1) + datetime.timedelta(days=number)
+    return {
+        "id": vid,
+        "title": f"Benchmark video {number}",
+        "uploader": "Benchmark Channel",
+        "upload_date": upload.strftime("%Y%m%d"),
+        "duration": 60 + number % 600,
+        "ext": "mp4",
+    }
+
+def lookup(context, key):
+    value = context
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def render(template, context):
+    """Fill a yt-dlp output template; missing fields become NA like in yt-dlp"""
+    def field(match):
+        value = lookup(context, match.group("key"))
+        if match.group("conv") == "j":
+            return json.dumps(value)
+        if value is None:
+            return "NA"
+        if match.group("fmt") and match.group("key") == "upload_date":
+            return datetime.datetime.strptime(value, "%Y%m%d").strftime(match.group("fmt"))
+        return str(value)
+    return TEMPLATE_FIELD.sub(field, template)
+
+def split_print(template):
+    """Return (stage, template) of a --print argument"""
+    match = STAGE_PREFIX.match(template)
+    if not match:
+        return "video", template
+    return match.group(0)[:-1], template[match.end():]
+
+def parse(argv):
+    args = {"prints": [], "outputs": {}, "flags": set(), "url": ""}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in WITH_VALUE and i + 1 < len(argv):
+            if arg == "--print":
+                args["prints"].append(argv[i + 1])
+            elif arg == "-o":
+                match = OUTPUT_TYPE.match(argv[i + 1])
+                kind = match.group(0)[:-1] if match else "default"
+                args["outputs"][kind] = argv[i + 1][match.end():] if match else argv[i + 1]
+            else:
+                args[arg] = argv[i + 1]
+            i += 2
+            continue
+        if arg.startswith("-"):
+            args["flags"].add(arg)
+        else:
+            args["url"] = arg
+        i += 1
+    return args
+
+def list_channel(args, out):
+    start = int(args.get("--playlist-start", 1))
+    end = min(int(args.get("--playlist-end", VIDEOS)), VIDEOS)
+    templates = [template for stage, template in map(split_print, args["prints"])] or ["%(id)s"]
+    for position in range(start, end + 1):
+        info = video_info(video_id(position))
+        for template in templates:
+            out.print(render(template, info))
+    return 0
+
+def side_stem(args, info, kind, stem):
+    template = args["outputs"].get(kind)
+    return os.path.splitext(render(template, info))[0] if template else stem
+
+def write_side_files(args, info, stem):
+    thumbnail_stem = side_stem(args, info, "thumbnail", stem)
+    description_stem = side_stem(args, info, "description", stem)
+    info_stem = side_stem(args, info, "infojson", stem)
+    if "--write-thumbnail" in args["flags"]:
+        with open(thumbnail_stem + ".jpg", "wb") as f:
+            f.write(b"\xff\xd8\xff\xe0" + bytes(2048))
+    if "--write-description" in args["flags"]:
+        with open(description_stem + ".description", "w", encoding="utf-8") as f:
+            f.write(f"Description of {info['title']}\n")
+    if "--write-info-json" in args["flags"]:
+        with open(info_stem + ".info.json", "w", encoding="utf-8") as f:
+            json.dump(info, f)
+
+def download_stream(args, out, info, filename, fails, progress_template):
+    """Write one media file with progress output; returns False if the video fails half way"""
+    if os.path.exists(filename) and "--no-overwrites" in args["flags"]:
+        return True
+    part_path = filename + ".part"
+    chunk = bytes(max(SIZE // PROGRESS_LINES, 1))
+    started = time.perf_counter()
+    log_every = max(PROGRESS_LINES // LOG_LINES, 1) if LOG_LINES else 0
+    logged = 0
+    with open(part_path, "wb") as f:
+        for line in range(1, PROGRESS_LINES + 1):
+            f.write(chunk)
+            downloaded = min(line * len(chunk), SIZE)
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            progress = {
+                "status": "downloading",
+                "downloaded_bytes": downloaded,
+                "total_bytes": SIZE,
+                "total_bytes_estimate": None,
+                "speed": downloaded / elapsed,
+                "eta": int((SIZE - downloaded) / (downloaded / elapsed)),
+            }
+            if progress_template:
+                out.print(render(progress_template, {"info": info, "progress": progress}))
+            if log_every and line % log_every == 0 and logged < LOG_LINES:
+                logged += 1
+                out.print(f"WARNING: [download] Got error: read timed out. Retrying ({logged}/10)...")
+            if fails and line >= PROGRESS_LINES // 2:
+                out.print(f"ERROR: [youtube] {info['id']}: This video is unavailable")
+                return False
+    os.replace(part_path, filename)
+    if progress_template:
+        out.print(render(progress_template, {"info": info, "progress": {
+            "status": "finished", "downloaded_bytes": SIZE, "total_bytes": SIZE,
+            "total_bytes_estimate": None, "speed": None, "eta": None}}))
+    return True
+
+def download(args, out):
+    vid = args["url"].rsplit("=", 1)[-1]
+    base_info = video_info(vid)
+    template = args["outputs"].get("default", "%(title)s.%(ext)s")
+    # "(a,b)/c" downloads every format of the group as its own file
+    split = "," in args.get("-f", "").split("/")[0]
+    format_ids = SPLIT_FORMATS if split else ("18",)
+    prints = [split_print(template) for template in args["prints"]]
+    fails = zlib.crc32(vid.encode()) % 10000 < ERROR_RATE * 10000
+    progress_template = args.get("--progress-template")
+    if progress_template:
+        progress_template = split_print(progress_template)[1]
+
+    for format_id in format_ids:
+        info = dict(base_info, format_id=format_id, ext="m4a" if format_id == "140" else "mp4")
+        filename = render(template, info)
+        info.update(filename=filename, filepath=filename, _filename=filename)
+        stem = os.path.splitext(filename)[0]
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+        if "--skip-download" in args["flags"]:
+            write_side_files(args, info, stem)
+            return 0
+
+        for stage, print_template in prints:
+            if stage == "before_dl":
+                out.print(render(print_template, info))
+        if not download_stream(args, out, info, filename, fails, progress_template):
+            return 1
+        write_side_files(args, info, stem)
+        for stage, print_template in prints:
+            if stage == "after_move":
+                out.print(render(print_template, info))
+    return 0
+
+def main(argv):
+    if "--version" in argv:
+        print(VERSION)
+        return 0
+    args = parse(argv)
+    out = Output()
+    try:
+        if "--flat-playlist" in args["flags"]:
+            return list_channel(args, out)
+        return download(args, out)
+    finally:
+        out.close()
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
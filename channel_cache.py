@@ -0,0 +1,85 @@
+"""
+Channel listing cache
+- One JSON file per channel URL with its video IDs newest first, plus title, duration and upload date
+- Fresh listings (younger than the TTL) are served without running yt-dlp at all
+- Stale listings are refreshed with a delta: only the pages above the newest cached video are fetched
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from cookie_store import write_atomic
+
+# Seconds a listing is served from the cache before it gets a delta refresh
+DEFAULT_LISTING_TTL = 3600
+# Complete listings are walked from scratch after this long, so deleted videos drop out
+FULL_REFRESH_AGE = 7 * 24 * 3600
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".youtube_downloader_cache", "channels")
+
+class ChannelListing:
+    """The cached listing of one channel"""
+
+    def __init__(self, url, entries=None, complete=False, listed_at=0.0, created_at=None):
+        self.url = url
+        # Dicts with id, title, duration and upload_date, newest first
+        self.entries = entries or []
+        # True once the listing reached the oldest video of the channel
+        self.complete = complete
+        self.listed_at = listed_at
+        self.created_at = created_at if created_at is not None else listed_at
+
+    @property
+    def ids(self):
+        return [entry["id"] for entry in self.entries]
+
+    def age(self):
+        return time.time() - self.listed_at
+
+    def covers(self, limit):
+        """Return True if the first `limit` videos (0 = all) are in the listing"""
+        return self.complete or (limit > 0 and len(self.entries) >= limit)
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "complete": self.complete,
+            "listed_at": self.listed_at,
+            "created_at": self.created_at,
+            "entries": self.entries,
+        }
+
+class ChannelCache:
+    """On-disk store of channel listings, one file per channel URL"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_LISTING_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        digest = hashlib.sha1(url.strip().rstrip("/").encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json")
+
+    def load(self, url):
+        """Return the cached ChannelListing of a channel, or None"""
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - data.get("created_at", 0) > FULL_REFRESH_AGE:
+            return None
+        return ChannelListing(url, data.get("entries", []), data.get("complete", False),
+                              data.get("listed_at", 0.0), data.get("created_at"))
+
+    def is_fresh(self, listing, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        return listing is not None and listing.age() < ttl
+
+    def save(self, listing):
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_atomic(self._path(listing.url), json.dumps(listing.to_dict(), ensure_ascii=False),
+                         prefix=".listing-")
@@ -0,0 +1,313 @@
+"""
+Command line interface
+- Syncs many channels without a GUI, for headless servers and cron jobs
+- Channel URLs come from the arguments and/or a file with one URL per line
+- Progress and the final summary are written to stdout as JSON lines, logs go to stderr
+- Never imports tkinter or selenium
+"""
+
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from backends import BACKENDS
+from controller import MAX_FRAGMENTS, DownloadController, parse_rate
+from dedup import DEDUP_MODES, DEDUP_OFF, DEDUP_HARDLINK
+from download_index import DownloadIndex
+from metrics import MetricsServer
+from log_pipeline import setup_logging
+from engine import (DownloadEngine, DEFAULT_OPTIONS, DEFAULT_COOKIE_PATH, DEFAULT_INDEX_PATH,
+                    DEFAULT_DOWNLOAD_PATH, DEFAULT_WORKERS, MAX_WORKERS)
+
+DEFAULT_CHANNELS = 2
+PROGRESS_INTERVAL = 2.0
+
+class JsonReporter:
+    """Writes one JSON object per line to stdout, safe to call from any thread"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        self.trackers = {}
+
+    def emit(self, event, **fields):
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def report_progress(self, controller=None, post=None):
+        """Emit a progress record for every channel that is downloading, plus the controller and pool state"""
+        for url, tracker in list(self.trackers.items()):
+            snapshot = tracker.snapshot()
+            self.emit("progress", channel=url, **{key: round(value, 2) if isinstance(value, float) else value
+                                                   for key, value in snapshot.items()})
+        if controller is not None and self.trackers:
+            state = controller.state()
+            state["speed"] = round(state["speed"], 2)
+            self.emit("controller", **state)
+        if post is not None and self.trackers:
+            queued, running = post.depths()
+            self.emit("postprocess", queued=queued, running=running, workers=post.workers)
+
+def read_batch_file(path):
+    """Return the channel URLs in a file, skipping blank lines and # comments"""
+    urls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                urls.append(line)
+    return urls
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="app.py",
+        description="Download YouTube channels without the GUI. Progress and a summary are printed as JSON lines."
+    )
+    parser.add_argument("urls", nargs="*", help="channel URLs to sync")
+    parser.add_argument("-a", "--batch-file", help="file with one channel URL per line")
+    parser.add_argument("--resume", action="store_true",
+                        help="also resume channel syncs interrupted by a crash or shutdown, with their original options")
+    parser.add_argument("-o", "--output", default=DEFAULT_DOWNLOAD_PATH, help="download location")
+    parser.add_argument("--staging-dir", default="",
+                        help="download and merge on this local directory, then move finished videos to --output")
+    parser.add_argument("--min-free-space", type=float, default=None,
+                        help="GiB a download must leave free on --output and --staging-dir "
+                             "(default: 2 with --staging-dir, no check without)")
+    parser.add_argument("--limit", type=int, default=0, help="limit number of videos per channel (0 = all)")
+    parser.add_argument("--listing-ttl", type=float, default=DEFAULT_OPTIONS["listing_ttl"] / 60,
+                        help="minutes a cached channel listing is reused before it is refreshed (0 = always refresh)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parallel downloads per channel")
+    parser.add_argument("--channels", type=int, default=DEFAULT_CHANNELS, help="channels synced at the same time")
+    parser.add_argument("--max-downloads", type=int, default=None,
+                        help="parallel downloads shared by all channels (default: workers x channels)")
+    parser.add_argument("--limit-rate", default="0",
+                        help="bandwidth budget shared by all downloads, e.g. 500K or 4M bytes/sec (0 = unlimited)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="raise or lower the parallel downloads to maximise throughput under the budget")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_OPTIONS["max_workers"],
+                        help="upper limit for --adaptive")
+    parser.add_argument("--concurrent-fragments", type=int, default=DEFAULT_OPTIONS["fragments"],
+                        help="fragments each video downloads in parallel (0 = tune on measured throughput)")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_OPTIONS["backend"],
+                        help="run one yt-dlp process per video, or yt-dlp's Python API in reusable worker processes")
+    parser.add_argument("--no-thumbnails", action="store_true", help="don't download thumbnails")
+    parser.add_argument("--no-descriptions", action="store_true", help="don't download descriptions")
+    parser.add_argument("--subtitles", action="store_true", help="download English subtitles")
+    parser.add_argument("--no-info-json", action="store_true",
+                        help="don't keep yt-dlp's .info.json next to every video (used by the GUI library search)")
+    parser.add_argument("--no-best-quality", action="store_true", help="let yt-dlp pick the format")
+    parser.add_argument("--no-postprocess-pool", action="store_true",
+                        help="let yt-dlp merge the best-quality streams inside the download slot")
+    parser.add_argument("--checksums", action="store_true", help="write a .sha256 file next to every video")
+    parser.add_argument("--thumbnail-width", type=int, default=DEFAULT_OPTIONS["thumbnail_width"],
+                        help="convert thumbnails to JPEG no wider than this many pixels (0 = keep as downloaded)")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default=DEFAULT_OPTIONS["dedup"],
+                        help="replace videos whose content is already in the library by a link "
+                             "(reflink falls back to hardlink)")
+    parser.add_argument("--dedup-library", action="store_true",
+                        help="hash the download location and link duplicate videos before syncing "
+                             "(hardlinks unless --dedup reflink)")
+    parser.add_argument("--metadata-only", action="store_true",
+                        help="only fetch thumbnails, descriptions, subtitles and info JSON, no media")
+    parser.add_argument("--cookies", default=DEFAULT_COOKIE_PATH, help="pickled cookies saved by the GUI login")
+    parser.add_argument("--no-cookies", action="store_true", help="don't use saved cookies")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="download index database")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between progress records (0 = off)")
+    parser.add_argument("--metrics-file", help="write per-video timings and throughput to this .json or .csv file")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running (0 = off)")
+    parser.add_argument("--log-file",
+                        help="also write the log to this file, rotated and gzip-compressed (default: stderr only)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only log warnings and errors to stderr")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run the command line interface and return the process exit code"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    log_pipeline = setup_logging(args.log_file, logging.WARNING if args.quiet else logging.INFO)
+    try:
+        return run(args)
+    finally:
+        log_pipeline.stop()
+
+def run(args):
+    """Sync the channels given on the command line"""
+
+    urls = list(args.urls)
+    if args.batch_file:
+        try:
+            urls.extend(read_batch_file(args.batch_file))
+        except OSError as e:
+            logging.error(f"Cannot read batch file: {e}")
+            return 2
+
+    index = DownloadIndex(args.index)
+    job_options = {}
+    if args.resume:
+        for url, stored_options in index.resumable_channel_jobs():
+            job_options[url] = stored_options
+            urls.insert(0, url)
+
+    # Keep the order but sync every channel only once
+    urls = list(dict.fromkeys(urls))
+    if not urls and not args.dedup_library:
+        logging.error("No channel URLs given")
+        return 2
+
+    options = dict(DEFAULT_OPTIONS)
+    options.update({
+        "download_path": args.output,
+        "staging_path": args.staging_dir,
+        "min_free_space": int(args.min_free_space * 1024 ** 3) if args.min_free_space is not None else None,
+        "thumbnails": not args.no_thumbnails,
+        "descriptions": not args.no_descriptions,
+        "subtitles": args.subtitles,
+        "best_quality": not args.no_best_quality,
+        "info_json": not args.no_info_json,
+        "limit": max(args.limit, 0),
+        "listing_ttl": max(args.listing_ttl, 0) * 60,
+        "workers": min(max(args.workers, 1), MAX_WORKERS),
+        "fragments": min(max(args.concurrent_fragments, 0), MAX_FRAGMENTS),
+        "use_cookies": not args.no_cookies,
+        "backend": args.backend,
+        "postprocess": not args.no_postprocess_pool,
+        "checksums": args.checksums,
+        "thumbnail_width": max(args.thumbnail_width, 0),
+        "dedup": args.dedup,
+    })
+    try:
+        bandwidth_limit = parse_rate(args.limit_rate)
+    except ValueError:
+        logging.error(f"Invalid --limit-rate: {args.limit_rate}")
+        return 2
+    channels = max(args.channels, 1)
+    max_downloads = args.max_downloads or options["workers"] * min(channels, len(urls))
+    max_workers = max(args.max_workers, max_downloads) if args.adaptive else max_downloads
+
+    reporter = JsonReporter()
+    controller = DownloadController(
+        workers=max(max_downloads, 1),
+        max_workers=min(max_workers, MAX_WORKERS * channels),
+        bandwidth_limit=bandwidth_limit,
+        adaptive=args.adaptive
+    )
+    engine = DownloadEngine(index, args.cookies, controller=controller)
+    controller.log = engine.log
+
+    def stop(signum, frame):
+        # Interrupted videos stay queued in the index and are continued by --resume
+        if not engine.stopping:
+            logging.warning("Stopping downloads...")
+            engine.shutdown()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.dedup_library:
+        mode = args.dedup if args.dedup != DEDUP_OFF else DEDUP_HARDLINK
+        started = time.time()
+        files, linked, freed = engine.dedup.scan(options["download_path"], mode, should_stop=lambda: engine.stopping)
+        reporter.emit("dedup", path=options["download_path"], files=files, linked=linked, freed_bytes=freed,
+                      elapsed=round(time.time() - started, 2))
+        if not urls:
+            index.close()
+            return 0
+
+    if not engine.check_ytdlp(options["backend"]):
+        logging.error("yt-dlp not found! Please install it with: pip install yt-dlp")
+        return 2
+
+    metrics_server = None
+    if args.metrics_port:
+        try:
+            metrics_server = MetricsServer(engine.metrics, args.metrics_port)
+        except OSError as e:
+            logging.error(f"Cannot serve metrics on port {args.metrics_port}: {e}")
+            return 2
+        logging.info(f"Serving metrics on http://127.0.0.1:{metrics_server.port}/metrics")
+
+    def sync(url):
+        reporter.emit("channel_started", channel=url)
+        try:
+            channel_options = dict(options)
+            channel_options.update(job_options.get(url, {}))
+            if args.metadata_only:
+                summary = engine.fetch_metadata(
+                    url,
+                    channel_options,
+                    on_start=lambda tracker: reporter.trackers.__setitem__(url, tracker)
+                )
+            else:
+                summary = engine.sync_channel(
+                    url,
+                    channel_options,
+                    on_start=lambda tracker: reporter.trackers.__setitem__(url, tracker),
+                    on_video_finished=lambda video_id, success, file_path: reporter.emit(
+                        "video", channel=url, id=video_id, status="done" if success else "failed", file=file_path
+                    )
+                )
+        except Exception as e:
+            logging.error(f"Error syncing {url}: {e}")
+            summary = {"url": url, "total": 0, "completed": 0, "failed": 0, "files": [], "error": str(e),
+                       "interrupted": engine.stopping}
+        finally:
+            reporter.trackers.pop(url, None)
+        summary = {key: value for key, value in summary.items() if key not in ("url", "files")}
+        summary["elapsed"] = round(summary.get("elapsed", 0), 2)
+        reporter.emit("channel_finished", channel=url, **summary)
+        return summary
+
+    stop_progress = threading.Event()
+
+    def progress_loop():
+        while not stop_progress.wait(args.progress_interval):
+            reporter.report_progress(controller, engine.post)
+
+    if args.progress_interval > 0:
+        threading.Thread(target=progress_loop, daemon=True).start()
+
+    started = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=channels) as pool:
+            summaries = list(pool.map(sync, urls))
+    finally:
+        stop_progress.set()
+        # Merges and staging moves still running record their results in the index, let them finish first
+        engine.shutdown(wait=True)
+        index.close()
+        if metrics_server:
+            metrics_server.close()
+
+    if args.metrics_file:
+        try:
+            engine.metrics.export(args.metrics_file)
+        except OSError as e:
+            logging.error(f"Cannot write metrics file: {e}")
+
+    completed = sum(summary["completed"] for summary in summaries)
+    failed = sum(summary["failed"] for summary in summaries)
+    errors = sum(1 for summary in summaries if "error" in summary)
+    interrupted = sum(1 for summary in summaries if summary.get("interrupted"))
+    reporter.emit(
+        "summary",
+        channels=len(summaries),
+        completed=completed,
+        failed=failed,
+        channel_errors=errors,
+        interrupted=interrupted,
+        elapsed=round(time.time() - started, 2)
+    )
+    return 0 if failed == 0 and errors == 0 and interrupted == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
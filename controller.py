@@ -0,0 +1,223 @@
+"""
+Download controller
+- Global bytes/sec budget, split across the downloads that are running
+- Adaptive concurrency: measures per-stream and total throughput and adds or removes
+  download slots to get the most out of the link without going over the budget
+- No new download starts while the throttle circuit breaker is open
+- Fragments fetched in parallel within one video (yt-dlp -N) are tuned on the throughput of
+  finished downloads, so a single large video can fill the link too
+"""
+
+import re
+import time
+import logging
+import threading
+
+from retry import CircuitBreaker
+
+# Seconds between two concurrency decisions, long enough for new streams to ramp up
+ADJUST_INTERVAL = 15.0
+# Treat the budget as used up above this fraction of it
+BUDGET_HEADROOM = 0.95
+# A new slot has to raise total throughput by this much to be kept
+MIN_GAIN = 1.05
+# Per-stream throughput below this fraction of the best seen suggests YouTube is throttling
+THROTTLE_RATIO = 0.5
+# Parallel fragments per video: first guess and upper bound
+DEFAULT_FRAGMENTS = 4
+MAX_FRAGMENTS = 16
+# Smaller downloads are dominated by start-up time and say nothing about fragment concurrency
+FRAGMENT_SAMPLE_BYTES = 32 * 1024 * 1024
+# Large downloads measured at one fragment count before deciding on the next
+FRAGMENT_SAMPLES = 2
+
+def parse_rate(text):
+    """Parse a rate such as "500K", "4.5M" or "1048576" into bytes/sec (0 = unlimited)"""
+    match = re.fullmatch(r"([\d.]+)\s*([KMG]?)I?B?(?:/S)?", str(text).strip().upper())
+    if not match:
+        raise ValueError(f"invalid rate: {text}")
+    multiplier = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[match.group(2)]
+    return int(float(match.group(1)) * multiplier)
+
+class FragmentTuner:
+    """Hill-climbs the fragments per video on the throughput of large finished downloads
+
+    Doubles the count while that makes downloads faster, halves it when a lower count was as fast.
+    """
+
+    def __init__(self, start=DEFAULT_FRAGMENTS, max_fragments=MAX_FRAGMENTS, log=None):
+        self.max_fragments = max_fragments
+        self.log = log or (lambda message, level="info": logging.info(message))
+        self._lock = threading.Lock()
+        self._current = min(max(start, 1), max_fragments)
+        # fragment count -> moving average of bytes/sec per download
+        self._speeds = {}
+        self._samples = 0
+
+    def current(self):
+        with self._lock:
+            return self._current
+
+    def record(self, fragments, size, speed):
+        """Feed a finished download of `size` bytes that ran with `fragments` parallel fragments at `speed` bytes/sec"""
+        if size < FRAGMENT_SAMPLE_BYTES or not speed:
+            return
+        with self._lock:
+            previous = self._speeds.get(fragments)
+            self._speeds[fragments] = speed if previous is None else previous * 0.7 + speed * 0.3
+            if fragments != self._current:
+                return
+            self._samples += 1
+            if self._samples < FRAGMENT_SAMPLES:
+                return
+            self._samples = 0
+
+            here = self._speeds[self._current]
+            fewer = max(self._current // 2, 1)
+            more = min(self._current * 2, self.max_fragments)
+            if fewer != self._current and self._speeds.get(fewer, 0) * MIN_GAIN >= here:
+                new = fewer
+            elif more != self._current and (more not in self._speeds or self._speeds[more] > here * MIN_GAIN):
+                new = more
+            else:
+                return
+            self.log(f"Fragment concurrency: {self._current} -> {new} per video "
+                     f"({here / (1024 * 1024):.1f} MiB/s per download)")
+            self._current = new
+
+class DownloadController:
+    """Decides how many downloads may run at once and how fast each of them may go"""
+
+    def __init__(self, workers=3, max_workers=16, bandwidth_limit=0, adaptive=False, log=None):
+        self.min_workers = 1
+        self.max_workers = max_workers
+        self.target = min(max(workers, 1), max_workers)
+        self.bandwidth_limit = bandwidth_limit
+        self.adaptive = adaptive
+        self.reason = "adaptive" if adaptive else "fixed"
+        self.log = log or (lambda message, level="info": logging.info(message))
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._speeds = {}
+        self._last_adjust = time.time()
+        self._last_total = None
+        self._last_change = 0
+        self._best_stream_speed = 0.0
+        self.fragments = FragmentTuner(log=lambda message, level="info": self.log(message, level))
+        # self.log is replaced by the CLI after construction, so look it up on every call
+        self.breaker = CircuitBreaker(log=lambda message, level="info": self.log(message, level))
+
+    def configure(self, workers=None, max_workers=None, bandwidth_limit=None, adaptive=None):
+        """Apply new settings; running downloads keep going, new ones follow the new limits"""
+        with self._cond:
+            if max_workers is not None:
+                self.max_workers = max(max_workers, 1)
+            if workers is not None:
+                self.target = min(max(workers, 1), self.max_workers)
+            if bandwidth_limit is not None:
+                self.bandwidth_limit = max(bandwidth_limit, 0)
+            if adaptive is not None:
+                self.adaptive = adaptive
+            self.reason = "adaptive" if self.adaptive else "fixed"
+            self._last_total = None
+            self._last_change = 0
+            self._last_adjust = time.time()
+            self._cond.notify_all()
+
+    def acquire(self, stop_event=None):
+        """Wait for a download slot; returns False if stop_event was set while waiting"""
+        if not self.breaker.wait(stop_event):
+            return False
+        with self._cond:
+            while self._active >= self.target:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                self._cond.wait(0.5)
+            self._active += 1
+            return True
+
+    def release(self, video_id=None):
+        """Give a slot back once a download has finished"""
+        with self._cond:
+            self._active -= 1
+            self._speeds.pop(video_id, None)
+            self._cond.notify_all()
+
+    def throttled(self):
+        """YouTube is throttling: pause every download, and run fewer of them when adapting"""
+        self.breaker.throttled()
+        with self._cond:
+            if self.adaptive and self.target > self.min_workers:
+                self.target -= 1
+                self.reason = "throttled"
+                self._last_change = -1
+                self._last_adjust = time.time()
+
+    def rate_limit(self):
+        """Return the bytes/sec a new download may use, or None when there is no budget"""
+        with self._cond:
+            if not self.bandwidth_limit:
+                return None
+            return max(int(self.bandwidth_limit / max(self.target, 1)), 1024)
+
+    def record(self, video_id, speed):
+        """Feed the current speed of a running download"""
+        with self._cond:
+            if speed is not None:
+                self._speeds[video_id] = speed
+            if self.adaptive and time.time() - self._last_adjust >= ADJUST_INTERVAL:
+                self._adjust()
+
+    def _adjust(self):
+        """Hill-climb the number of slots on measured total throughput (caller holds the lock)"""
+        self._last_adjust = time.time()
+        total = sum(self._speeds.values())
+        streams = len(self._speeds)
+        if not streams:
+            return
+        stream_speed = total / streams
+        self._best_stream_speed = max(self._best_stream_speed, stream_speed)
+
+        change = 0
+        if self.bandwidth_limit and total >= self.bandwidth_limit * BUDGET_HEADROOM:
+            if self.target > streams or self._last_change > 0:
+                change, self.reason = -1, "at bandwidth limit"
+            else:
+                self.reason = "at bandwidth limit"
+        elif stream_speed < self._best_stream_speed * THROTTLE_RATIO and self.target > self.min_workers:
+            change, self.reason = -1, "throttling suspected"
+        elif self._last_change > 0 and self._last_total and total < self._last_total * MIN_GAIN:
+            # The extra slot didn't pay off, go back
+            change, self.reason = -1, "no gain from more streams"
+        elif self._last_change < 0 and self.reason == "no gain from more streams":
+            # Stay at the level that worked for one more interval before probing again
+            self.reason = "holding"
+        elif streams >= self.target:
+            change, self.reason = 1, "probing"
+
+        new_target = min(max(self.target + change, self.min_workers), self.max_workers)
+        if new_target != self.target:
+            self.log(f"Adaptive concurrency: {self.target} -> {new_target} parallel downloads ({self.reason}, "
+                     f"{total / (1024 * 1024):.1f} MiB/s total)")
+            self.target = new_target
+            self._cond.notify_all()
+        else:
+            change = 0
+        self._last_change = change
+        self._last_total = total
+
+    def state(self):
+        """Return the current limits and measurements for display"""
+        with self._cond:
+            return {
+                "target": self.target,
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "speed": sum(self._speeds.values()),
+                "bandwidth_limit": self.bandwidth_limit,
+                "adaptive": self.adaptive,
+                "reason": self.reason,
+                "paused": round(self.breaker.paused_for(), 1),
+                "fragments": self.fragments.current(),
+            }
@@ -0,0 +1,113 @@
+"""
+Cookie store
+- Keeps the Netscape cookies.txt export of the pickled Selenium cookies
+- Regenerates the export only when the pickle changes (mtime/size, then content hash)
+- Writes the export atomically and reports expired login cookies before a long job starts
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+
+# Cookies YouTube needs for a logged-in session
+SESSION_COOKIES = ("SID", "HSID", "SSID", "APISID", "SAPISID", "LOGIN_INFO",
+                   "__Secure-1PSID", "__Secure-3PSID")
+
+def format_netscape(cookies):
+    """Return the Netscape cookie file text for a list of Selenium cookie dicts"""
+    lines = ["# Netscape HTTP Cookie File"]
+    for cookie in cookies:
+        secure = "TRUE" if cookie.get('secure', False) else "FALSE"
+        expires = str(int(cookie.get('expiry', 0))) if 'expiry' in cookie else "0"
+        # Format: domain, flag, path, secure, expires, name, value
+        lines.append("\t".join((
+            cookie.get('domain', ''),
+            "TRUE",  # Include subdomains
+            cookie.get('path', '/'),
+            secure,
+            expires,
+            cookie.get('name', ''),
+            cookie.get('value', ''),
+        )))
+    return "\n".join(lines) + "\n"
+
+def write_atomic(path, text, prefix=".cookies-"):
+    """Write a file through a temporary file and a rename, so readers never see half of it"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=prefix, suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        # The cookie export holds session secrets, nothing else written here needs to be shared
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class CookieStore:
+    """Cached cookies.txt export of the pickled cookies saved by the login window"""
+
+    def __init__(self, pickle_path, txt_path=None):
+        self.pickle_path = pickle_path
+        self.txt_path = txt_path or os.path.join(os.path.dirname(pickle_path), "cookies.txt")
+        self._lock = threading.Lock()
+        self._stat = None
+        self._digest = None
+        self._cookies = []
+
+    def exists(self):
+        return os.path.exists(self.pickle_path)
+
+    def export(self):
+        """Return the path of an up-to-date cookies.txt, regenerating it only if the pickle changed
+
+        Returns (path, regenerated). Raises OSError or pickle errors if the pickle can't be read.
+        """
+        with self._lock:
+            st = os.stat(self.pickle_path)
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if stat_key == self._stat and os.path.exists(self.txt_path):
+                return self.txt_path, False
+
+            with open(self.pickle_path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            self._stat = stat_key
+            if digest == self._digest and os.path.exists(self.txt_path):
+                # Touched but not changed, e.g. saved again with the same session
+                return self.txt_path, False
+
+            self._cookies = pickle.loads(data)
+            write_atomic(self.txt_path, format_netscape(self._cookies))
+            self._digest = digest
+            return self.txt_path, True
+
+    def expired_session_cookies(self, horizon=0):
+        """Return the names of the session cookies that are expired or expire within `horizon` seconds
+
+        Call export() first so the cookies are loaded.
+        """
+        deadline = time.time() + horizon
+        with self._lock:
+            cookies = list(self._cookies)
+        expired = []
+        for cookie in cookies:
+            if cookie.get('name') not in SESSION_COOKIES or 'expiry' not in cookie:
+                continue
+            if cookie['expiry'] <= deadline:
+                expired.append(cookie['name'])
+        return sorted(set(expired))
+
+    def invalidate(self):
+        """Forget the cached state, e.g. after the cookies were cleared"""
+        with self._lock:
+            self._stat = None
+            self._digest = None
+            self._cookies = []
@@ -0,0 +1,200 @@
+"""
+Content deduplication
+- Finished downloads are hashed with SHA-256, reading memory-mapped files in chunks
+- Hashes are kept in the download index; a file whose content is already in the library is replaced
+  by a reflink clone where the file system supports it, or by a hardlink, under its own path and name
+- Video IDs map to their content, so a video that is already on disk is linked instead of downloaded again
+- Library scans hash on a thread pool, hashlib releases the GIL so several files are hashed at once
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from library import VIDEO_EXTENSIONS
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no reflinks, hardlinks still work
+    fcntl = None
+
+DEDUP_OFF = "off"
+DEDUP_HARDLINK = "hardlink"
+# Copy-on-write clone, falls back to a hardlink on file systems without reflinks
+DEDUP_REFLINK = "reflink"
+DEDUP_MODES = (DEDUP_OFF, DEDUP_HARDLINK, DEDUP_REFLINK)
+HASH_CHUNK = 8 * 1024 * 1024
+# Linux FICLONE ioctl (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+HASH_WORKERS = min(os.cpu_count() or 2, 8)
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and some network file systems can't be mapped
+            mapped = None
+        if mapped is None:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        else:
+            with mapped, memoryview(mapped) as data:
+                for offset in range(0, len(data), HASH_CHUNK):
+                    digest.update(data[offset:offset + HASH_CHUNK])
+    return digest.hexdigest()
+
+def _reflink(source, target):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def link_file(source, target, mode):
+    """Replace target with a link to source's content; return "reflink", "hardlink" or None if impossible
+
+    target may not exist yet. The replacement is atomic, target never disappears.
+    """
+    try:
+        if os.path.exists(target) and os.path.samefile(source, target):
+            return None
+        source_stat = os.stat(source)
+        target_dir = os.path.dirname(target) or "."
+        if os.stat(target_dir).st_dev != source_stat.st_dev:
+            # Links can't cross file systems
+            return None
+        target_stat = os.stat(target) if os.path.exists(target) else None
+    except OSError:
+        return None
+
+    tmp_path = os.path.join(target_dir, f".{os.path.basename(target)}.dedup")
+    method = None
+    if mode == DEDUP_REFLINK:
+        try:
+            _reflink(source, tmp_path)
+            method = DEDUP_REFLINK
+            if target_stat:
+                # A clone has its own inode, so the file keeps its timestamps
+                os.utime(tmp_path, ns=(target_stat.st_atime_ns, target_stat.st_mtime_ns))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    if method is None:
+        try:
+            os.link(source, tmp_path)
+            method = DEDUP_HARDLINK
+        except OSError:
+            return None
+    try:
+        os.replace(tmp_path, target)
+    except OSError:
+        os.remove(tmp_path)
+        return None
+    return method
+
+def sidecar_video_id(path):
+    """Return the video ID from the .info.json written next to a video, if there is one"""
+    try:
+        with open(os.path.splitext(path)[0] + ".info.json", encoding="utf-8") as f:
+            return json.load(f).get("id")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class Deduplicator:
+    """Links duplicate files together and remembers which content every video ID has"""
+
+    def __init__(self, index, log=None):
+        self.index = index
+        self.log = log or (lambda message, level="info": None)
+        # Recording a file and looking up an earlier copy must not interleave between threads
+        self._lock = threading.Lock()
+
+    def add(self, path, digest, mode, video_id=None):
+        """Record a hashed file and link it to an earlier copy of the same content
+
+        Returns the number of bytes freed (0 if nothing was linked).
+        """
+        with self._lock:
+            stat = os.stat(path)
+            self.index.record_content(path, digest, stat.st_size, stat.st_mtime_ns, video_id)
+            if mode == DEDUP_OFF:
+                return 0
+            for source in self.index.content_paths(digest):
+                if source == path or not os.path.exists(source):
+                    continue
+                method = link_file(source, path, mode)
+                if method is None:
+                    continue
+                stat = os.stat(path)
+                self.index.record_content(path, digest, stat.st_size, stat.st_mtime_ns)
+                self.log(f"{os.path.basename(path)} has the same content as {source}, replaced by a {method}")
+                return stat.st_size
+            return 0
+
+    def link_known(self, video_ids, download_path, mode):
+        """Link videos whose content is already on disk into download_path
+
+        Returns {video_id: file path} for the videos that don't need downloading.
+        """
+        found = {}
+        download_path = os.path.abspath(download_path)
+        for video_id, (digest, recorded_path) in self.index.content_for_ids(video_ids).items():
+            sources = [path for path in self.index.content_paths(digest) if os.path.exists(path)]
+            if not sources:
+                continue
+            # Same <uploader>/<file> layout as the output template, under the video's own name
+            target = os.path.join(download_path, os.path.basename(os.path.dirname(recorded_path)),
+                                  os.path.basename(recorded_path))
+            if os.path.exists(recorded_path) and os.path.abspath(recorded_path) == os.path.abspath(target):
+                found[video_id] = recorded_path
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target) or any(link_file(source, target, mode) for source in sources):
+                found[video_id] = target
+        return found
+
+    def scan(self, root, mode, workers=HASH_WORKERS, should_stop=None):
+        """Hash every video under root and link the duplicates
+
+        Files whose size and mtime match the index are not hashed again.
+        Returns (files, linked, bytes freed).
+        """
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.lower().endswith(VIDEO_EXTENSIONS):
+                    paths.append(os.path.join(dirpath, filename))
+
+        def digest_of(path):
+            if should_stop and should_stop():
+                return path, None
+            try:
+                stat = os.stat(path)
+                digest = self.index.stored_digest(path, stat.st_size, stat.st_mtime_ns)
+                return path, digest or file_digest(path)
+            except OSError as e:
+                self.log(f"Cannot hash {path}: {e}", "warning")
+                return path, None
+
+        linked = 0
+        freed = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            # Linking runs here, in order, while the pool keeps hashing
+            for path, digest in pool.map(digest_of, paths):
+                if digest is None:
+                    continue
+                try:
+                    saved = self.add(path, digest, mode, sidecar_video_id(path))
+                except OSError as e:
+                    self.log(f"Cannot deduplicate {path}: {e}", "warning")
+                    continue
+                if saved:
+                    linked += 1
+                    freed += saved
+        return len(paths), linked, freed
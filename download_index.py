@@ -0,0 +1,285 @@
+"""
+Download index
+- Persistent SQLite record of every video the downloader has seen
+- Keyed by YouTube video ID so channel syncs only fetch new uploads
+- Content hashes of the library, for deduplication
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# Failures that retrying can't fix; later syncs skip them
+STATUS_UNAVAILABLE = "unavailable"
+# Members-only, age-restricted or private: retried once the user logs in again
+STATUS_NEEDS_LOGIN = "needs_login"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_url TEXT,
+    status TEXT NOT NULL,
+    file_path TEXT,
+    file_size INTEGER,
+    upload_date TEXT,
+    options TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS videos_channel ON videos (channel_url, status);
+CREATE TABLE IF NOT EXISTS channels (
+    channel_url TEXT PRIMARY KEY,
+    complete INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    video_id TEXT PRIMARY KEY,
+    channel_url TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS channel_jobs (
+    channel_url TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    options TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS content (
+    file_path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    file_size INTEGER,
+    mtime_ns INTEGER,
+    video_id TEXT
+);
+CREATE INDEX IF NOT EXISTS content_digest ON content (digest);
+CREATE INDEX IF NOT EXISTS content_video ON content (video_id);
+"""
+
+class DownloadIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # The connection is shared by the worker threads, access goes through self._lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def is_known(self, video_id):
+        """Return True if the video has been seen by a previous sync"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def known_ids(self, video_ids):
+        """Return the subset of video_ids that are already in the index"""
+        video_ids = list(video_ids)
+        found = set()
+        with self._lock:
+            # Stay below SQLite's limit on query parameters
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT video_id FROM videos WHERE video_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def unfinished_ids(self, channel_url):
+        """Return the IDs of a channel that were listed before but never completed
+
+        Videos that were interrupted while downloading come first. Unavailable videos and ones
+        that need a login are left out.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM videos WHERE channel_url = ? AND status NOT IN (?, ?, ?) "
+                "ORDER BY status = ? DESC, rowid",
+                (channel_url, STATUS_DONE, STATUS_UNAVAILABLE, STATUS_NEEDS_LOGIN, STATUS_RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def interrupted_videos(self, channel_url):
+        """Return (video_id, expected file path) for downloads that were cut off by a crash or shutdown"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, file_path FROM videos WHERE channel_url = ? AND status = ? ORDER BY rowid",
+                (channel_url, STATUS_RUNNING)
+            ).fetchall()
+        return rows
+
+    def add_pending(self, channel_url, video_ids):
+        """Record newly listed videos without touching ones already in the index"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO videos (video_id, channel_url, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(video_id, channel_url, STATUS_PENDING, now) for video_id in video_ids]
+            )
+            self._conn.commit()
+
+    def mark_running(self, video_id, file_path=None):
+        """Flag a video as being downloaded, optionally with the file it is written to"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE videos SET status = ?, file_path = COALESCE(?, file_path), updated_at = ? WHERE video_id = ?",
+                (STATUS_RUNNING, file_path, time.time(), video_id)
+            )
+            self._conn.commit()
+
+    def mark_done(self, video_id, file_path, file_size, upload_date, options):
+        """Store a finished download with the options it was made with"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE videos SET status = ?, file_path = ?, file_size = ?, upload_date = ?, options = ?, updated_at = ? "
+                "WHERE video_id = ?",
+                (STATUS_DONE, file_path, file_size, upload_date, json.dumps(options, sort_keys=True), time.time(), video_id)
+            )
+            self._conn.commit()
+
+    def mark_failed(self, video_id, status=STATUS_FAILED):
+        """Flag a failed video; plain failures are retried by the next sync, the others are not"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE videos SET status = ?, updated_at = ? WHERE video_id = ?",
+                (status, time.time(), video_id)
+            )
+            self._conn.commit()
+
+    def reset_needs_login(self):
+        """Let the next syncs retry the videos that failed for want of a login; returns how many"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE videos SET status = ?, updated_at = ? WHERE status = ?",
+                (STATUS_FAILED, time.time(), STATUS_NEEDS_LOGIN)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def has_metadata(self, video_ids):
+        """Return the subset of video_ids whose metadata pass already succeeded"""
+        video_ids = list(video_ids)
+        found = set()
+        with self._lock:
+            # Stay below SQLite's limit on query parameters
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT video_id FROM metadata WHERE video_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def mark_metadata(self, video_id, channel_url):
+        """Record that thumbnails, descriptions and info JSON of a video were fetched"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (video_id, channel_url, fetched_at) VALUES (?, ?, ?)",
+                (video_id, channel_url, time.time())
+            )
+            self._conn.commit()
+
+    def is_channel_complete(self, channel_url):
+        """Return True if the whole channel has been listed at least once"""
+        with self._lock:
+            row = self._conn.execute("SELECT complete FROM channels WHERE channel_url = ?", (channel_url,)).fetchone()
+        return bool(row and row[0])
+
+    def mark_channel_synced(self, channel_url, complete):
+        """Remember when a channel was listed and whether the listing reached its oldest video"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO channels (channel_url, complete, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(channel_url) DO UPDATE SET complete = MAX(complete, excluded.complete), synced_at = excluded.synced_at",
+                (channel_url, int(complete), time.time())
+            )
+            self._conn.commit()
+
+    def start_channel_job(self, channel_url, options):
+        """Persist a channel sync so it can be resumed after a crash or restart"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO channel_jobs (channel_url, state, options, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(channel_url) DO UPDATE SET state = excluded.state, options = excluded.options, "
+                "updated_at = excluded.updated_at",
+                (channel_url, STATUS_RUNNING, json.dumps(options, sort_keys=True), now, now)
+            )
+            self._conn.commit()
+
+    def finish_channel_job(self, channel_url, state):
+        """Record the final state (done or failed) of a channel sync"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE channel_jobs SET state = ?, updated_at = ? WHERE channel_url = ?",
+                (state, time.time(), channel_url)
+            )
+            self._conn.commit()
+
+    def resumable_channel_jobs(self):
+        """Return (channel_url, options) for every sync that never reached a final state"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_url, options FROM channel_jobs WHERE state IN (?, ?) ORDER BY created_at",
+                (STATUS_PENDING, STATUS_RUNNING)
+            ).fetchall()
+        return [(channel_url, json.loads(options) if options else {}) for channel_url, options in rows]
+
+    def record_content(self, file_path, digest, file_size, mtime_ns, video_id=None):
+        """Store the hash of a library file, and which video it is if known"""
+        with self._lock:
+            # An upsert keeps the rowid, so the first copy of some content stays the first
+            self._conn.execute(
+                "INSERT INTO content (file_path, digest, file_size, mtime_ns, video_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(file_path) DO UPDATE SET digest = excluded.digest, file_size = excluded.file_size, "
+                "mtime_ns = excluded.mtime_ns, video_id = COALESCE(excluded.video_id, video_id)",
+                (file_path, digest, file_size, mtime_ns, video_id)
+            )
+            self._conn.commit()
+
+    def stored_digest(self, file_path, file_size, mtime_ns):
+        """Return the recorded hash of a file, or None if it is unknown or changed since"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM content WHERE file_path = ? AND file_size = ? AND mtime_ns = ?",
+                (file_path, file_size, mtime_ns)
+            ).fetchone()
+        return row[0] if row else None
+
+    def content_paths(self, digest):
+        """Return the files recorded with this hash, oldest record first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path FROM content WHERE digest = ? ORDER BY rowid", (digest,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def content_for_ids(self, video_ids):
+        """Return {video_id: (digest, file path)} for the videos whose content has been hashed"""
+        video_ids = list(video_ids)
+        found = {}
+        with self._lock:
+            # Stay below SQLite's limit on query parameters
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT video_id, digest, file_path FROM content WHERE video_id IN ({', '.join('?' * len(chunk))}) "
+                    "ORDER BY rowid",
+                    chunk
+                ).fetchall()
+                for video_id, digest, file_path in rows:
+                    found.setdefault(video_id, (digest, file_path))
+        return found
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,887 @@
+"""
+Download engine
+- Builds the yt-dlp commands, converts the saved cookies and supervises the yt-dlp processes
+- Downloads go through a backend: one yt-dlp process per video, or the yt-dlp API in worker processes
+- Lists channels incrementally against the download index and downloads the videos with a worker pool
+- Channel listings are cached on disk and refreshed with a delta that stops at the newest cached video
+- Merging and other CPU work run on a separate post-processing pool, so download slots don't wait for ffmpeg
+- Finished files are hashed and duplicates across channels are replaced by links
+- With a staging directory, downloads and merges run on local scratch space and finished videos
+  are moved into the library afterwards
+- Has no GUI dependencies, it is shared by the Tk app and the command line
+"""
+
+import os
+import re
+import time
+import glob
+import atexit
+import logging
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from backends import (BACKEND_API, BACKEND_SUBPROCESS, SubprocessBackend, YtDlpApiBackend,
+                      ytdlp_api_available)
+from channel_cache import DEFAULT_LISTING_TTL, ChannelCache, ChannelListing
+from controller import DownloadController
+from cookie_store import CookieStore
+from download_index import STATUS_DONE, STATUS_FAILED, STATUS_NEEDS_LOGIN, STATUS_UNAVAILABLE
+from metrics import RunMetrics
+from dedup import DEDUP_OFF, Deduplicator
+from retry import (FAILURE_AUTH, FAILURE_THROTTLE, FAILURE_TRANSIENT, FAILURE_UNAVAILABLE, FailureLog,
+                   RetryQueue)
+from staging import MIN_FREE_SPACE, check_free_space, free_space
+from postprocess import STREAM_SUFFIX, PostProcessStage, ffmpeg_available, stream_final_path
+from progress import PROGRESS_TEMPLATE, ProgressTracker, format_bytes, format_eta
+
+# Output layout shared by every download job
+OUTPUT_TEMPLATE = "%(uploader)s/%(upload_date>%Y-%m-%d)s - %(title)s.%(ext)s"
+BEST_QUALITY_FORMAT = "bestvideo[ext=mp4][vcodec!=none]+bestaudio[ext=m4a][acodec!=none]/best[ext=mp4][vcodec!=none][acodec!=none]"
+# Same choice of streams, but downloaded as separate files for the post-processing pool to merge
+SPLIT_QUALITY_FORMAT = "(bestvideo[ext=mp4][vcodec!=none],bestaudio[ext=m4a][acodec!=none])/best[ext=mp4][vcodec!=none][acodec!=none]"
+SPLIT_OUTPUT_TEMPLATE = "%(uploader)s/%(upload_date>%Y-%m-%d)s - %(title)s.f%(format_id)s.%(ext)s"
+VIDEO_URL_TEMPLATE = "https://www.youtube.com/watch?v={}"
+# Printed by yt-dlp once a video has been moved to its final location
+DONE_MARKER = "__done__"
+DONE_TEMPLATE = "after_move:" + DONE_MARKER + "\t%(id)s\t%(upload_date)s\t%(filepath)s"
+# Printed before the media is fetched, so an interrupted download can be matched to its .part files
+START_MARKER = "__start__"
+START_TEMPLATE = "before_dl:" + START_MARKER + "\t%(id)s\t%(filename)s"
+# What follows the stem in the name of a .part file
+PARTIAL_SUFFIX = re.compile(r"(?:%s)?\.\w+\.part" % STREAM_SUFFIX.pattern)
+# One line per video of a flat channel listing
+LISTING_TEMPLATE = "%(id)s\t%(title)s\t%(duration)s\t%(upload_date)s"
+DEFAULT_WORKERS = 3
+MAX_WORKERS = 16
+# The metadata pass only fetches small files, so it runs many more requests at once
+METADATA_WORKERS = 16
+# Seconds a yt-dlp process gets to exit after SIGTERM before it is killed
+SHUTDOWN_TIMEOUT = 5
+# Seconds between two free-space checks while downloads are held back
+SPACE_RECHECK_INTERVAL = 15
+# Warn when the login session expires within this many seconds of starting a sync
+COOKIE_EXPIRY_HORIZON = 12 * 3600
+
+DEFAULT_COOKIE_PATH = os.path.join(os.path.expanduser("~"), ".youtube_downloader_cookies.pkl")
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(DEFAULT_COOKIE_PATH), ".youtube_downloader_index.db")
+DEFAULT_DOWNLOAD_PATH = os.path.join(os.path.expanduser("~"), "Downloads", "YouTubeDownloads")
+
+DEFAULT_OPTIONS = {
+    "download_path": DEFAULT_DOWNLOAD_PATH,
+    "thumbnails": True,
+    "descriptions": True,
+    "subtitles": False,
+    "best_quality": True,
+    "limit": 0,
+    "workers": DEFAULT_WORKERS,
+    "use_cookies": True,
+    # Global settings of the DownloadController, applied by the front end
+    "bandwidth_limit": 0,
+    "adaptive": False,
+    "max_workers": 8,
+    # "subprocess" runs one yt-dlp process per video, "api" uses yt-dlp's Python API in worker processes
+    "backend": BACKEND_SUBPROCESS,
+    # Seconds a channel listing is reused before it is refreshed (0 = always refresh)
+    "listing_ttl": DEFAULT_LISTING_TTL,
+    # Merge best-quality streams on the post-processing pool instead of inside yt-dlp
+    "postprocess": True,
+    # Write a <video>.sha256 file next to every download
+    "checksums": False,
+    # Convert thumbnails to JPEG no wider than this (0 = keep them as downloaded)
+    "thumbnail_width": 0,
+    # Replace files whose content is already in the library by a link: "off", "hardlink" or "reflink"
+    "dedup": DEDUP_OFF,
+    # Keep yt-dlp's .info.json next to every video, the library index reads titles and durations from it
+    "info_json": True,
+    # Local scratch directory for .part files and merges, finished videos are moved to download_path ("" = off)
+    "staging_path": "",
+    # Fragments each video downloads in parallel (yt-dlp -N), 0 = tuned on measured throughput
+    "fragments": 0,
+    # Bytes a download must leave free; None = staging.MIN_FREE_SPACE with a staging directory, no check without
+    "min_free_space": None,
+}
+
+def default_log(message, level="info"):
+    """Log through the logging module when no other sink is given"""
+    if level == "error":
+        logging.error(message)
+    elif level == "warning":
+        logging.warning(message)
+    else:
+        logging.info(message)
+
+def find_partial_files(file_path):
+    """Return the .part files yt-dlp left behind for an expected output file"""
+    if not file_path:
+        return []
+    # The recorded path of a split download is one of its streams, <stem>.f<format>.<ext>
+    stem = os.path.splitext(stream_final_path(file_path))[0]
+    # Separate video/audio streams are written as <stem>.f<format>.<ext>.part. The glob alone would
+    # also match other videos whose title starts with this one.
+    return sorted(path for path in glob.glob(glob.escape(stem) + ".*part")
+                  if PARTIAL_SUFFIX.fullmatch(path[len(stem):]))
+
+def splits_streams(options):
+    """Return True if best-quality streams are downloaded separately and merged by the post-processing pool"""
+    # Without ffmpeg on the PATH yt-dlp falls back to a single-file format by itself
+    return bool(options.get("postprocess") and options["best_quality"] and ffmpeg_available())
+
+def dedup_enabled(options):
+    return options.get("dedup", DEDUP_OFF) != DEDUP_OFF
+
+def required_free_space(options):
+    """Return the free bytes the download and staging directories must keep, 0 = don't check"""
+    if options.get("min_free_space") is None:
+        return MIN_FREE_SPACE if options.get("staging_path") else 0
+    return max(int(options["min_free_space"]), 0)
+
+def needs_postprocessing(options):
+    # Moving a video out of the staging directory is post-processing too
+    return splits_streams(options) or bool(options.get("checksums")) or dedup_enabled(options) or bool(
+        options.get("thumbnails") and options.get("thumbnail_width")) or bool(options.get("staging_path"))
+
+def build_video_command(video_id, download_path, cookie_args, options, executable="yt-dlp", rate_limit=None,
+                        split_streams=False, fragments=None):
+    """Build the yt-dlp command that downloads a single video"""
+    cmd = [executable]
+    cmd.extend(cookie_args)
+
+    # Share of the global bandwidth budget, in bytes/sec
+    if rate_limit:
+        cmd.extend(["--limit-rate", str(int(rate_limit))])
+
+    if fragments:
+        cmd.extend(["--concurrent-fragments", str(int(fragments))])
+
+    # Add output template
+    if split_streams:
+        # Only the streams carry the format ID, the side files keep the name of the merged video
+        cmd.extend(["-o", os.path.join(download_path, SPLIT_OUTPUT_TEMPLATE)])
+        for kind in ("thumbnail", "description", "subtitle", "infojson"):
+            cmd.extend(["-o", f"{kind}:" + os.path.join(download_path, OUTPUT_TEMPLATE)])
+    else:
+        cmd.extend(["-o", os.path.join(download_path, OUTPUT_TEMPLATE)])
+
+    # Add options
+    if options["thumbnails"]:
+        cmd.append("--write-thumbnail")
+
+    if options["descriptions"]:
+        cmd.append("--write-description")
+
+    if options["subtitles"]:
+        cmd.extend(["--write-sub", "--sub-lang", "en"])
+
+    if options.get("info_json", True):
+        cmd.append("--write-info-json")
+
+    if options["best_quality"]:
+        cmd.extend(["-f", SPLIT_QUALITY_FORMAT if split_streams else BEST_QUALITY_FORMAT])
+
+    # Add other useful options
+    cmd.extend(["--no-playlist", "--continue", "--no-overwrites"])
+
+    # Report the final file path and machine-readable progress, one event per line.
+    # --print implies --quiet, so the progress lines have to be requested explicitly.
+    cmd.extend(["--print", START_TEMPLATE, "--print", DONE_TEMPLATE])
+    cmd.extend(["--progress", "--newline", "--progress-template", PROGRESS_TEMPLATE])
+
+    cmd.append(VIDEO_URL_TEMPLATE.format(video_id))
+    return cmd
+
+def build_metadata_command(video_id, download_path, cookie_args, options, executable="yt-dlp"):
+    """Build the yt-dlp command that fetches the metadata of a video without its media"""
+    cmd = [executable]
+    cmd.extend(cookie_args)
+
+    # Same layout as the video downloads, so the files end up next to each other
+    cmd.extend(["-o", os.path.join(download_path, OUTPUT_TEMPLATE)])
+    cmd.extend(["--skip-download", "--write-info-json"])
+
+    if options["thumbnails"]:
+        cmd.append("--write-thumbnail")
+
+    if options["descriptions"]:
+        cmd.append("--write-description")
+
+    if options["subtitles"]:
+        cmd.extend(["--write-sub", "--sub-lang", "en"])
+
+    cmd.extend(["--no-playlist", "--no-overwrites", "--no-progress"])
+    cmd.append(VIDEO_URL_TEMPLATE.format(video_id))
+    return cmd
+
+class DownloadEngine:
+    """Runs channel syncs; one engine can serve several channels at once"""
+
+    def __init__(self, index, cookie_path=DEFAULT_COOKIE_PATH, log=None, executable="yt-dlp", controller=None,
+                 listings=None, metrics=None):
+        self.index = index
+        self.cookie_path = cookie_path
+        self.cookies = CookieStore(cookie_path) if cookie_path else None
+        self.log = log or default_log
+        self.executable = executable
+        # Limits the downloads running at once and their bandwidth, across every channel of this engine
+        self.controller = controller or DownloadController(log=self.log)
+        self.listings = listings or ChannelCache()
+        # Per-video timings and throughput of everything this engine downloads
+        self.metrics = metrics or RunMetrics()
+        # CPU-bound work after the download: merging, thumbnails, checksums
+        self.post = PostProcessStage()
+        self.dedup = Deduplicator(index, self.log)
+        self._process_lock = threading.Lock()
+        self._processes = set()
+        self._stopping = threading.Event()
+        # Channels with a sync running; their videos in the running state are being downloaded, not interrupted
+        self._syncing = set()
+        self._syncing_lock = threading.Lock()
+        # Held by the worker that waits for free disk space
+        self._space_lock = threading.Lock()
+        self._backends = {BACKEND_SUBPROCESS: SubprocessBackend(self)}
+        self._backend_lock = threading.Lock()
+        # Child processes must not outlive the app, even if it exits without calling shutdown()
+        atexit.register(self.shutdown)
+
+    def check_ytdlp(self, backend=BACKEND_SUBPROCESS):
+        """Return the installed yt-dlp version, or None if it can't be run"""
+        return self.get_backend(backend).version()
+
+    def get_backend(self, name):
+        """Return the download backend for an option value, falling back to subprocesses"""
+        with self._backend_lock:
+            if name == BACKEND_API and name not in self._backends:
+                if ytdlp_api_available():
+                    # Sized for the most downloads the controller can ever allow at once
+                    self._backends[name] = YtDlpApiBackend(max(self.controller.max_workers, self.controller.target))
+                else:
+                    self.log("The yt_dlp Python package is not installed, using the yt-dlp command instead", "warning")
+                    self._backends[name] = self._backends[BACKEND_SUBPROCESS]
+            return self._backends.get(name, self._backends[BACKEND_SUBPROCESS])
+
+    def prepare_cookies(self):
+        """Return the yt-dlp arguments for the saved cookies, re-exporting them only when they changed"""
+        if not self.cookies or not self.cookies.exists():
+            return []
+
+        try:
+            cookies_txt_path, regenerated = self.cookies.export()
+        except Exception as e:
+            self.log(f"Error converting cookies: {e}", "error")
+            return []
+        if regenerated:
+            self.log(f"Cookies converted successfully to {cookies_txt_path}")
+        return ["--cookies", cookies_txt_path]
+
+    def check_cookies(self, horizon=COOKIE_EXPIRY_HORIZON):
+        """Return (expired, expiring) session cookie names, so a dead login is caught before a long job"""
+        if not self.cookies or not self.cookies.exists():
+            return [], []
+        try:
+            self.cookies.export()
+        except Exception:
+            return [], []
+        expired = self.cookies.expired_session_cookies()
+        expiring = [name for name in self.cookies.expired_session_cookies(horizon) if name not in expired]
+        return expired, expiring
+
+    def is_syncing(self, url):
+        """Return True while a sync of this channel is running"""
+        with self._syncing_lock:
+            return url in self._syncing
+
+    @property
+    def stopping(self):
+        return self._stopping.is_set()
+
+    def resumable_jobs(self):
+        """Return (channel_url, options) for the syncs that were interrupted by a crash or shutdown"""
+        return self.index.resumable_channel_jobs()
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT, wait=False):
+        """Stop taking new videos and terminate the running yt-dlp processes
+
+        Interrupted videos and channel jobs stay in the running state, so the next
+        sync picks them up first and yt-dlp continues their .part files.
+        With wait, running post-processing jobs finish and record their results before this returns;
+        call it that way before closing the index.
+        """
+        self._stopping.set()
+        with self._process_lock:
+            processes = list(self._processes)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.time() + timeout
+        for process in processes:
+            try:
+                process.wait(max(deadline - time.time(), 0))
+            except subprocess.TimeoutExpired:
+                process.kill()
+        with self._backend_lock:
+            backends = set(self._backends.values())
+        for backend in backends:
+            backend.shutdown(max(deadline - time.time(), 0))
+        # Queued jobs are dropped, their streams are merged by the next sync
+        self.post.shutdown(wait=wait)
+
+    def sync_channel(self, url, options, on_start=None, on_video_finished=None):
+        """Download the videos of a channel that are not in the index yet and return a summary
+
+        on_start(tracker) is called once the listing is done and downloads begin.
+        on_video_finished(video_id, success, file_path) is called from the worker threads.
+        The sync is stored as a channel job until it finishes, so it can be resumed after a restart.
+        Raises RuntimeError if the channel is being synced already.
+        """
+        with self._syncing_lock:
+            if url in self._syncing:
+                # A second yt-dlp would write to the same .part files
+                raise RuntimeError(f"{url} is already being downloaded")
+            self._syncing.add(url)
+        try:
+            self.index.start_channel_job(url, options)
+            try:
+                summary = self._sync_channel(url, options, on_start, on_video_finished)
+            except Exception:
+                if not self.stopping:
+                    self.index.finish_channel_job(url, STATUS_FAILED)
+                raise
+
+            summary["interrupted"] = self.stopping
+            if not self.stopping:
+                self.index.finish_channel_job(url, STATUS_DONE if summary["failed"] == 0 else STATUS_FAILED)
+            return summary
+        finally:
+            with self._syncing_lock:
+                self._syncing.discard(url)
+
+    def _sync_channel(self, url, options, on_start, on_video_finished):
+        started = time.time()
+        download_path = options["download_path"]
+        os.makedirs(download_path, exist_ok=True)
+        if options.get("staging_path"):
+            os.makedirs(options["staging_path"], exist_ok=True)
+        needed = required_free_space(options)
+        if needed:
+            # Raises OSError, a full disk fails the sync before anything is listed
+            check_free_space(download_path, needed)
+            if options.get("staging_path"):
+                check_free_space(options["staging_path"], needed)
+
+        cookie_args = []
+        if options.get("use_cookies", True):
+            cookie_args = self.prepare_cookies()
+            expired, expiring = self.check_cookies()
+            if expired:
+                self.log(f"Login session has expired ({', '.join(expired)}), log in again for members-only or age-restricted videos", "error")
+            elif expiring:
+                self.log(f"Login session expires within {COOKIE_EXPIRY_HORIZON // 3600} hours ({', '.join(expiring)})", "warning")
+
+        # Phase 1: list only the uploads the index hasn't seen yet
+        video_ids = self.list_new_videos(url, options["limit"], cookie_args, options.get("listing_ttl"))
+        self.metrics.record_listing(url, time.time() - started)
+        if dedup_enabled(options) and video_ids:
+            video_ids = self._link_known_videos(video_ids, download_path, options)
+        summary = {"url": url, "total": len(video_ids), "completed": 0, "failed": 0, "files": []}
+        if not video_ids:
+            self.log("No new videos to download")
+            summary["elapsed"] = time.time() - started
+            return summary
+
+        # Phase 2: hand the video IDs to a pool of yt-dlp workers.
+        # The controller decides how many of them download at once.
+        workers = options["workers"]
+        if self.controller.adaptive:
+            workers = max(workers, self.controller.max_workers)
+        workers = min(workers, len(video_ids))
+        self.log(f"{len(video_ids)} videos to download with {workers} parallel workers")
+
+        # Failed downloads come back into this queue after their backoff
+        jobs = RetryQueue(video_ids)
+        self.metrics.queued(url, video_ids)
+
+        tracker = ProgressTracker(len(video_ids))
+        if on_start:
+            on_start(tracker)
+
+        def on_finished(video_id, success, file_path):
+            if file_path:
+                summary["files"].append(file_path)
+            if on_video_finished:
+                on_video_finished(video_id, success, file_path)
+
+        # Videos handed to the post-processing pool; the sync is done once they are too
+        post_jobs = []
+        threads = [
+            threading.Thread(
+                target=self._download_worker,
+                args=(jobs, tracker, download_path, cookie_args, options, on_finished, post_jobs),
+                daemon=True
+            )
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        remaining = [recorded for recorded in post_jobs if not recorded.is_set()]
+        if remaining and not self.stopping:
+            self.log(f"Waiting for post-processing of {len(remaining)} videos")
+        for recorded in remaining:
+            while not recorded.wait(0.5) and not self.stopping:
+                pass
+
+        summary["completed"] = tracker.completed
+        summary["failed"] = tracker.failed
+        summary["elapsed"] = time.time() - started
+        return summary
+
+    def _link_known_videos(self, video_ids, download_path, options):
+        """Mark videos whose content is already on disk as done and return the ones left to download"""
+        linked = self.dedup.link_known(video_ids, download_path, options["dedup"])
+        for video_id, file_path in linked.items():
+            self.index.mark_done(video_id, file_path, os.path.getsize(file_path), None, options)
+        if linked:
+            self.log(f"{len(linked)} videos are already in the library, linked instead of downloaded")
+        return [video_id for video_id in video_ids if video_id not in linked]
+
+    def list_new_videos(self, url, limit, cookie_args, ttl=None):
+        """List the channel newest-first and return the videos that still need downloading"""
+        listing = self.list_channel_cached(url, limit, cookie_args, ttl, stop_at_known=True)
+        listed_ids = listing.ids[:limit] if limit > 0 else listing.ids
+        known = self.index.known_ids(listed_ids)
+        new_ids = [video_id for video_id in listed_ids if video_id not in known]
+
+        self.index.add_pending(url, new_ids)
+        self.index.mark_channel_synced(url, listing.complete)
+        self.log(f"Found {len(new_ids)} new videos")
+
+        # Downloads cut off by a crash or shutdown go first, so their .part files are continued
+        resume_ids = []
+        for video_id, file_path in self.index.interrupted_videos(url):
+            partial_files = find_partial_files(file_path)
+            if partial_files:
+                partial_size = sum(os.path.getsize(path) for path in partial_files if os.path.exists(path))
+                self.log(f"[{video_id}] Resuming interrupted download ({partial_size // (1024 * 1024)} MiB already on disk)")
+            resume_ids.append(video_id)
+
+        # Earlier failures are retried as well
+        queued = set(new_ids)
+        queued.update(resume_ids)
+        retry_ids = [video_id for video_id in self.index.unfinished_ids(url) if video_id not in queued]
+        if limit > 0:
+            seen = set(listed_ids)
+            retry_ids = [video_id for video_id in retry_ids if video_id in seen]
+        if resume_ids or retry_ids:
+            self.log(f"Retrying {len(resume_ids) + len(retry_ids)} unfinished videos from earlier runs")
+        return resume_ids + new_ids + retry_ids
+
+    def list_channel(self, url, limit, cookie_args, ttl=None):
+        """Return every video ID of a channel (or the newest `limit` of them), newest first"""
+        listing = self.list_channel_cached(url, limit, cookie_args, ttl)
+        return listing.ids[:limit] if limit > 0 else listing.ids
+
+    def list_channel_cached(self, url, limit, cookie_args, ttl=None, stop_at_known=False):
+        """Return the ChannelListing of a channel, running as little of the yt-dlp listing as possible
+
+        A listing younger than the TTL that covers `limit` is used as it is. Otherwise only the
+        uploads above the newest cached video are listed, and the older end is listed only when
+        the cache doesn't reach back far enough for `limit`.
+
+        stop_at_known is for syncs, which only need the videos the index hasn't seen. Once the index
+        has seen the whole channel, the listing stops at the first known video even without a cache,
+        and the older end is never listed.
+        """
+        # Everything older than the first known video was listed by an earlier sync
+        index_covers = stop_at_known and (limit > 0 or self.index.is_channel_complete(url))
+        listing = self.listings.load(url)
+        if listing and self.listings.is_fresh(listing, ttl) and (listing.covers(limit) or index_covers):
+            self.log(f"Using the cached listing of {url} ({len(listing.entries)} videos, "
+                     f"listed {format_eta(listing.age())} ago)")
+            return listing
+
+        listed_at = time.time()
+        if listing is None or not listing.entries:
+            listing = ChannelListing(url, listed_at=listed_at)
+            if index_covers:
+                # Missing or expired cache, the index stands in for it
+                entries, reached_known, returncode = self._run_listing(url, cookie_args, end=limit, stop_known=True)
+                listing.entries = entries
+                listing.complete = (not reached_known and returncode == 0
+                                    and (limit <= 0 or len(entries) < limit))
+                self.log(f"Listed {len(entries)} new uploads of {url}")
+        else:
+            # Delta refresh: newest first until the first video that is already cached
+            cached_ids = set(listing.ids)
+            entries, reached_cached, returncode = self._run_listing(url, cookie_args, stop_ids=cached_ids)
+            if reached_cached:
+                listing.entries = entries + listing.entries
+                listing.listed_at = listed_at
+            elif returncode == 0:
+                # Walked the whole channel without meeting the cache, so the new listing replaces it
+                listing.entries = entries
+                listing.complete = True
+                listing.listed_at = listed_at
+            else:
+                # The listing broke off, keep what we have and try again next time
+                new_ids = set(entry["id"] for entry in entries)
+                listing.entries = entries + [entry for entry in listing.entries if entry["id"] not in new_ids]
+                listing.complete = listing.complete and not entries
+            self.log(f"Listed {len(entries)} new uploads of {url}")
+
+        if not listing.covers(limit) and not index_covers:
+            # The cache doesn't reach back far enough, list the older end of the channel
+            start = len(listing.entries) + 1
+            entries, _, returncode = self._run_listing(url, cookie_args, start=start, end=limit)
+            known_ids = set(listing.ids)
+            listing.entries.extend(entry for entry in entries if entry["id"] not in known_ids)
+            wanted = limit - start + 1 if limit > 0 else None
+            # Fewer videos than asked for means the listing reached the oldest one
+            listing.complete = returncode == 0 and (wanted is None or len(entries) < wanted)
+            listing.listed_at = listed_at
+
+        self.listings.save(listing)
+        return listing
+
+    def _run_listing(self, url, cookie_args, stop_ids=None, start=None, end=None, stop_known=False):
+        """Run a flat yt-dlp listing and return (entries, stopped early, exit code)
+
+        The listing stops at the first video in stop_ids, or with stop_known at the first one in the index.
+        """
+        cmd = [self.executable, "--flat-playlist", "--print", LISTING_TEMPLATE, "--ignore-errors"]
+        cmd.extend(cookie_args)
+        if start and start > 1:
+            cmd.extend(["--playlist-start", str(start)])
+        if end and end > 0:
+            cmd.extend(["--playlist-end", str(end)])
+        cmd.append(url)
+
+        self.log(f"Executing command: {' '.join(cmd)}")
+        process = self._start_process(cmd, stderr=subprocess.DEVNULL)
+
+        entries = []
+        seen = set()
+        reached = False
+        try:
+            for line in process.stdout:
+                fields = [None if value in ("NA", "") else value for value in line.rstrip("\n").split("\t")]
+                video_id = fields[0]
+                if not video_id or video_id in seen:
+                    continue
+                if (stop_ids and video_id in stop_ids) or (stop_known and self.index.is_known(video_id)):
+                    # Everything older than this was listed before
+                    reached = True
+                    break
+                seen.add(video_id)
+                fields += [None] * (4 - len(fields))
+                try:
+                    duration = float(fields[2]) if fields[2] else None
+                except ValueError:
+                    duration = None
+                entries.append({"id": video_id, "title": fields[1], "duration": duration, "upload_date": fields[3]})
+
+            if reached:
+                process.terminate()
+            process.wait()
+        finally:
+            self._forget_process(process)
+
+        if not reached and process.returncode != 0:
+            self.log(f"Channel listing exited with code {process.returncode}, the video list may be incomplete", "warning")
+        return entries, reached, process.returncode
+
+    def fetch_metadata(self, url, options, on_start=None, refresh=False):
+        """Fetch thumbnails, descriptions, subtitles and info JSON for a whole channel, without media
+
+        Runs outside the download controller, so it doesn't take slots from video downloads.
+        Videos whose metadata was fetched before are skipped unless refresh is set.
+        """
+        started = time.time()
+        download_path = options["download_path"]
+        os.makedirs(download_path, exist_ok=True)
+        cookie_args = self.prepare_cookies() if options.get("use_cookies", True) else []
+
+        video_ids = self.list_channel(url, options["limit"], cookie_args, options.get("listing_ttl"))
+        if not refresh:
+            known = self.index.has_metadata(video_ids)
+            video_ids = [video_id for video_id in video_ids if video_id not in known]
+        summary = {"url": url, "total": len(video_ids), "completed": 0, "failed": 0}
+        self.log(f"Fetching metadata for {len(video_ids)} videos")
+
+        tracker = ProgressTracker(len(video_ids))
+        if on_start:
+            on_start(tracker)
+
+        def fetch(video_id):
+            if self.stopping:
+                return
+            tracker.start(video_id)
+            cmd = build_metadata_command(video_id, download_path, cookie_args, options, self.executable)
+            try:
+                process = self._start_process(cmd, stderr=subprocess.STDOUT)
+                try:
+                    for line in process.stdout:
+                        line = line.strip()
+                        if line and ("ERROR" in line or "WARNING" in line):
+                            self.log(f"[{video_id}] {line}", "error" if "ERROR" in line else "warning")
+                    process.wait()
+                finally:
+                    self._forget_process(process)
+                success = process.returncode == 0
+            except Exception as e:
+                self.log(f"[{video_id}] Error fetching metadata: {e}", "error")
+                success = False
+            if success:
+                self.index.mark_metadata(video_id, url)
+            tracker.finish(video_id, success)
+
+        with ThreadPoolExecutor(max_workers=METADATA_WORKERS) as pool:
+            list(pool.map(fetch, video_ids))
+
+        summary["completed"] = tracker.completed
+        summary["failed"] = tracker.failed
+        summary["elapsed"] = time.time() - started
+        summary["interrupted"] = self.stopping
+        return summary
+
+    def _download_worker(self, jobs, tracker, download_path, cookie_args, options, on_finished, post_jobs):
+        """Take video IDs from the queue until it is empty"""
+        while not self.stopping:
+            video_id = jobs.get(self._stopping)
+            if video_id is None:
+                return
+            if not self._wait_for_space(options):
+                jobs.done(video_id)
+                tracker.cancel(video_id)
+                self.metrics.finished(video_id, "interrupted")
+                return
+            if not self.controller.acquire(self._stopping):
+                jobs.done(video_id)
+                self.controller.breaker.release_probe()
+                tracker.cancel(video_id)
+                self.metrics.finished(video_id, "interrupted")
+                return
+
+            tracker.start(video_id)
+            self.metrics.started(video_id)
+            failures = FailureLog()
+            file_path = None
+            try:
+                file_path = self.download_video(video_id, tracker, download_path, cookie_args, options, failures)
+            except Exception as e:
+                self.log(f"[{video_id}] Error during download: {e}", "error")
+            finally:
+                self.controller.release(video_id)
+            if file_path is None and self.stopping:
+                # Not a failure, the video is continued by the next sync
+                jobs.done(video_id)
+                self.controller.breaker.release_probe()
+                tracker.cancel(video_id)
+                self.metrics.finished(video_id, "interrupted")
+                return
+            if file_path is not None:
+                self.controller.breaker.succeeded()
+            elif self._retry_failed(video_id, failures.classify(), jobs):
+                tracker.cancel(video_id)
+                self.metrics.requeued(video_id)
+                continue
+
+            jobs.done(video_id)
+            if isinstance(file_path, Future):
+                # The download slot is free already, the pool reports the result later
+                recorded = threading.Event()
+                post_jobs.append(recorded)
+                file_path.add_done_callback(
+                    lambda future, video_id=video_id, recorded=recorded: self._post_processed(
+                        video_id, future, tracker, options, on_finished, recorded)
+                )
+                continue
+            tracker.finish(video_id, file_path is not None)
+            self.metrics.finished(video_id, STATUS_DONE if file_path is not None else STATUS_FAILED)
+            on_finished(video_id, file_path is not None, file_path)
+
+    def _wait_for_space(self, options):
+        """Hold a download while the library or staging directory is short of space
+
+        One worker polls, the others queue up behind it. Returns False if the engine stopped while waiting.
+        """
+        needed = required_free_space(options)
+        if not needed:
+            return True
+        paths = [options["download_path"]]
+        if options.get("staging_path"):
+            paths.append(options["staging_path"])
+        with self._space_lock:
+            waiting_since = None
+            while not self.stopping:
+                short = [(path, free_space(path)) for path in paths]
+                short = [(path, free) for path, free in short if free < needed]
+                if not short:
+                    if waiting_since is not None:
+                        self.log(f"Enough free space again after {format_eta(time.time() - waiting_since)}, "
+                                 f"resuming downloads")
+                    return True
+                if waiting_since is None:
+                    waiting_since = time.time()
+                    path, free = short[0]
+                    self.log(f"Only {format_bytes(free)} free in {path}, holding downloads until "
+                             f"{format_bytes(needed)} are free", "warning")
+                self._stopping.wait(SPACE_RECHECK_INTERVAL)
+            return False
+
+    def _retry_failed(self, video_id, kind, jobs):
+        """Feed a failure to the circuit breaker and queue the video again if its class allows it
+
+        Returns True if the video was queued again.
+        """
+        if kind == FAILURE_THROTTLE:
+            self.controller.throttled()
+        elif kind == FAILURE_TRANSIENT:
+            # Says nothing about throttling, let another download probe
+            self.controller.breaker.release_probe()
+        else:
+            # YouTube answered, so it isn't throttling
+            self.controller.breaker.succeeded()
+
+        delay = jobs.retry(video_id, kind)
+        if delay is None:
+            if kind == FAILURE_AUTH:
+                self.index.mark_failed(video_id, STATUS_NEEDS_LOGIN)
+                self.log(f"[{video_id}] Needs a login with access to this video, log in again and re-sync", "error")
+            elif kind == FAILURE_UNAVAILABLE:
+                # Removed, private or blocked, later syncs don't try it again
+                self.index.mark_failed(video_id, STATUS_UNAVAILABLE)
+            return False
+        self.log(f"[{video_id}] {kind.capitalize()} error, trying again in {delay:.0f} s", "warning")
+        return True
+
+    def download_video(self, video_id, tracker, download_path, cookie_args, options, failures=None):
+        """Download a single video through the selected backend and return the final file path, or None on failure
+
+        failures (a retry.FailureLog) collects the error lines for classifying a failure.
+        """
+        backend = self.get_backend(options.get("backend", BACKEND_SUBPROCESS))
+        # Written to the staging directory, the post-processing pool moves it into download_path
+        target_path = options.get("staging_path") or download_path
+        self.index.mark_running(video_id)
+        fragments = options.get("fragments") or self.controller.fragments.current()
+        speeds = []
+
+        def on_progress(event):
+            # Progress events only feed the tracker, the UI polls it on its own timer
+            if event.status == "downloading" and event.speed:
+                speeds.append(event.speed)
+            tracker.update(event)
+            self.metrics.progress(event)
+            self.controller.record(video_id, event.speed if event.status != "finished" else None)
+
+        def on_output(line):
+            self.metrics.output(video_id, line)
+            if failures is not None:
+                failures.feed(line)
+            self.log(f"[{video_id}] {line}")
+
+        returncode, done_files = backend.download(
+            video_id, target_path, cookie_args, options, self.controller.rate_limit(),
+            on_start=lambda file_path: self.index.mark_running(video_id, file_path),
+            on_progress=on_progress,
+            on_output=on_output,
+            fragments=fragments
+        )
+
+        if self.stopping and not done_files:
+            # Stopped by shutdown(), the video stays in the running state for the next sync
+            self.log(f"[{video_id}] Download interrupted", "warning")
+            return None
+
+        if returncode != 0 or not done_files:
+            self.log(f"[{video_id}] Download failed with exit code {returncode}", "error")
+            self.index.mark_failed(video_id)
+            return None
+
+        if speeds and not options.get("fragments"):
+            # Average of the reported speeds, a resumed download doesn't count as fast
+            size = sum(os.path.getsize(path) for _, path in done_files if os.path.exists(path))
+            self.controller.fragments.record(fragments, size, sum(speeds) / len(speeds))
+
+        upload_date = done_files[-1][0]
+        if needs_postprocessing(options):
+            streams = [path for _, path in done_files]
+            job = {
+                "video_id": video_id,
+                "upload_date": upload_date,
+                "streams": streams,
+                "final_path": stream_final_path(streams[0]) if splits_streams(options) else streams[-1],
+                "thumbnails": options.get("thumbnails") and options.get("thumbnail_width", 0) > 0,
+                "thumbnail_width": options.get("thumbnail_width", 0),
+                "checksum": options.get("checksums", False),
+                "digest": dedup_enabled(options),
+                "staging_path": options.get("staging_path") or None,
+                "library_path": download_path,
+            }
+            # Returns a Future; None if the engine stopped while the queue was full
+            return self.post.submit(job, self._stopping)
+
+        file_path = done_files[-1][1]
+        try:
+            file_size = os.path.getsize(file_path)
+        except OSError:
+            file_size = None
+        self.index.mark_done(video_id, file_path, file_size, upload_date, options)
+        return file_path
+
+    def _post_processed(self, video_id, future, tracker, options, on_finished, recorded):
+        """Record the result of a post-processing job, called from the pool's callback thread"""
+        try:
+            self._record_post_result(video_id, future, tracker, options, on_finished)
+        except Exception as e:
+            self.log(f"[{video_id}] Error after post-processing: {e}", "error")
+        finally:
+            recorded.set()
+
+    def _record_post_result(self, video_id, future, tracker, options, on_finished):
+        if future.cancelled():
+            # Dropped by shutdown(), the next sync finds the streams on disk and queues the merge again
+            tracker.cancel(video_id)
+            self.metrics.finished(video_id, "interrupted")
+            return
+
+        error = future.exception()
+        if error is not None:
+            self.log(f"[{video_id}] Post-processing failed: {error}", "error")
+            self.index.mark_failed(video_id)
+            tracker.finish(video_id, False)
+            self.metrics.finished(video_id, STATUS_FAILED)
+            on_finished(video_id, False, None)
+            return
+
+        result = future.result()
+        for warning in result["warnings"]:
+            self.log(f"[{video_id}] {warning}", "warning")
+        if dedup_enabled(options) and result["checksum"]:
+            try:
+                self.dedup.add(result["file_path"], result["checksum"], options["dedup"], video_id)
+            except OSError as e:
+                self.log(f"[{video_id}] Deduplication failed: {e}", "warning")
+        self.index.mark_done(video_id, result["file_path"], result["file_size"], result["upload_date"], options)
+        tracker.finish(video_id, True)
+        self.metrics.finished(video_id, STATUS_DONE)
+        on_finished(video_id, True, result["file_path"])
+
+    def _start_process(self, cmd, stderr):
+        """Start a yt-dlp process and keep track of it until it exits"""
+        if self.stopping:
+            raise RuntimeError("The download engine is shutting down")
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            text=True,
+            bufsize=1
+        )
+        with self._process_lock:
+            self._processes.add(process)
+        return process
+
+    def _forget_process(self, process):
+        with self._process_lock:
+            self._processes.discard(process)
@@ -0,0 +1,1082 @@
+"""
+YouTube Channel Downloader GUI
+- Tk front end for the download engine
+- Uses Selenium to handle authentication and save cookies automatically
+"""
+
+import os
+import sys
+import json
+import time
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+import threading
+import collections
+import shutil
+import pickle
+import logging
+import platform
+import datetime
+from backends import BACKEND_API, BACKEND_SUBPROCESS
+from controller import MAX_FRAGMENTS
+from dedup import DEDUP_OFF, DEDUP_REFLINK
+from download_index import DownloadIndex
+from engine import (DownloadEngine, DEFAULT_OPTIONS, DEFAULT_COOKIE_PATH, DEFAULT_INDEX_PATH, DEFAULT_DOWNLOAD_PATH,
+                    DEFAULT_WORKERS, MAX_WORKERS)
+from library import LibraryIndex, LibraryScanner
+from log_pipeline import default_log_path, setup_logging
+from metrics import MetricsServer
+from progress import format_bytes, format_eta
+
+# Console output is buffered and flushed to the Text widget in batches
+CONSOLE_FLUSH_MS = 100
+CONSOLE_MAX_LINES = 5000
+# The status bar is refreshed from the progress tracker at a fixed rate
+PROGRESS_REFRESH_MS = 250
+# Rows of the library table held in the Treeview at once
+LIBRARY_PAGE_SIZE = 100
+# Typing pause before the search box runs its query
+SEARCH_DELAY_MS = 150
+LIBRARY_COLUMNS = (
+    ("title", "Tiêu đề", 260),
+    ("channel", "Kênh", 120),
+    ("upload_date", "Ngày đăng", 80),
+    ("duration", "Thời lượng", 70),
+    ("file_size", "Dung lượng", 80),
+    ("mtime", "Thời gian tải", 120),
+)
+# The stats window is refreshed at a slower rate than the progress bar
+STATS_REFRESH_MS = 1000
+STATS_COLUMNS = (
+    ("video_id", "Video", 110),
+    ("status", "Status", 80),
+    ("queued", "Queued (s)", 80),
+    ("download", "Download (s)", 90),
+    ("postprocess", "Merge (s)", 80),
+    ("bytes", "Size", 90),
+    ("avg_speed", "Avg speed", 90),
+    ("peak_speed", "Peak speed", 90),
+    ("retries", "Retries", 60),
+)
+
+class YouTubeDownloader:
+    def __init__(self, console_max_lines=CONSOLE_MAX_LINES):
+        self.root = tk.Tk()
+        self.root.title("YouTube Channel Downloader")
+        self.root.geometry("800x600")
+        self.root.minsize(800, 600)
+        
+        self.cookie_path = DEFAULT_COOKIE_PATH
+        self.index = DownloadIndex(DEFAULT_INDEX_PATH)
+        self.engine = DownloadEngine(self.index, self.cookie_path, log=self.log)
+        self.download_path = DEFAULT_DOWNLOAD_PATH
+        self.browser = None
+        self.cookies_loaded = False
+        # Set by the background login check, read when a download starts
+        self.cookies_expired = False
+        self.tracker = None
+        self.metadata_tracker = None
+        self.stats_window = None
+        self.metrics_server = None
+        
+        # Library table state: the scanner fills the library index on a worker thread,
+        # the table shows one page of an index query at a time
+        self.scanner = LibraryScanner()
+        self.library = LibraryIndex(DEFAULT_INDEX_PATH)
+        self._scan_lock = threading.Lock()
+        self._library_root = None
+        self._library_total = 0
+        self._library_sort = ("mtime", True)
+        # "after" key of every page up to the one shown, None for the first page
+        self._page_keys = [None]
+        self._next_page_key = None
+        self._search_job = None
+        self.last_run_files = set()
+        
+        # Ring buffer between the worker threads and the console widget.
+        # Lines older than the widget limit would be trimmed anyway, so the buffer shares it.
+        self.console_max_lines = console_max_lines
+        self._log_buffer = collections.deque(maxlen=console_max_lines)
+        
+        self.setup_ui()
+        # Shelling out to yt-dlp and looking for Chrome must not delay the first frame
+        threading.Thread(target=self.check_dependencies, daemon=True).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+    def setup_ui(self):
+        # Main frame
+        main_frame = ttk.Frame(self.root, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Title
+        title_label = ttk.Label(main_frame, text="YouTube Channel Downloader", font=("Arial", 18, "bold"))
+        title_label.pack(pady=10)
+        
+        # URL Input
+        url_frame = ttk.Frame(main_frame)
+        url_frame.pack(fill=tk.X, pady=10)
+        
+        url_label = ttk.Label(url_frame, text="YouTube Channel URL:")
+        url_label.pack(side=tk.LEFT, padx=5)
+        
+        self.url_entry = ttk.Entry(url_frame, width=50)
+        self.url_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        # Download Location
+        path_frame = ttk.Frame(main_frame)
+        path_frame.pack(fill=tk.X, pady=10)
+        
+        path_label = ttk.Label(path_frame, text="Download Location:")
+        path_label.pack(side=tk.LEFT, padx=5)
+        
+        self.path_entry = ttk.Entry(path_frame, width=50)
+        self.path_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.path_entry.insert(0, self.download_path)
+        
+        browse_button = ttk.Button(path_frame, text="Browse", command=self.browse_path)
+        browse_button.pack(side=tk.RIGHT, padx=5)
+        
+        # Options Frame
+        options_frame = ttk.LabelFrame(main_frame, text="Download Options", padding=10)
+        options_frame.pack(fill=tk.X, pady=10)
+        
+        # Checkboxes for options
+        self.download_thumbnails = tk.BooleanVar(value=True)
+        thumbnail_check = ttk.Checkbutton(options_frame, text="Download Thumbnails", variable=self.download_thumbnails)
+        thumbnail_check.grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        
+        self.download_descriptions = tk.BooleanVar(value=True)
+        desc_check = ttk.Checkbutton(options_frame, text="Download Descriptions", variable=self.download_descriptions)
+        desc_check.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        self.download_subtitles = tk.BooleanVar(value=False)
+        sub_check = ttk.Checkbutton(options_frame, text="Download Subtitles", variable=self.download_subtitles)
+        sub_check.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        
+        self.best_quality = tk.BooleanVar(value=True)
+        quality_check = ttk.Checkbutton(options_frame, text="Best Quality", variable=self.best_quality)
+        quality_check.grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        # Limit videos frame
+        limit_frame = ttk.Frame(options_frame)
+        limit_frame.grid(row=2, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        limit_label = ttk.Label(limit_frame, text="Limit number of videos (0 = all):")
+        limit_label.pack(side=tk.LEFT, padx=5)
+        
+        self.limit_entry = ttk.Entry(limit_frame, width=5)
+        self.limit_entry.pack(side=tk.LEFT, padx=5)
+        self.limit_entry.insert(0, "0")
+        
+        ttl_label = ttk.Label(limit_frame, text="Reuse channel listing for (minutes):")
+        ttl_label.pack(side=tk.LEFT, padx=5)
+        
+        self.listing_ttl_entry = ttk.Entry(limit_frame, width=5)
+        self.listing_ttl_entry.pack(side=tk.LEFT, padx=5)
+        self.listing_ttl_entry.insert(0, str(DEFAULT_OPTIONS["listing_ttl"] // 60))
+        
+        # Parallel downloads frame
+        workers_frame = ttk.Frame(options_frame)
+        workers_frame.grid(row=3, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        workers_label = ttk.Label(workers_frame, text="Parallel downloads:")
+        workers_label.pack(side=tk.LEFT, padx=5)
+        
+        self.workers_entry = ttk.Entry(workers_frame, width=5)
+        self.workers_entry.pack(side=tk.LEFT, padx=5)
+        self.workers_entry.insert(0, str(DEFAULT_WORKERS))
+        
+        self.use_api_backend = tk.BooleanVar(value=DEFAULT_OPTIONS["backend"] == BACKEND_API)
+        api_check = ttk.Checkbutton(workers_frame, text="Run yt-dlp in-process (needs the yt_dlp package)",
+                                    variable=self.use_api_backend)
+        api_check.pack(side=tk.LEFT, padx=5)
+        
+        # Bandwidth and adaptive concurrency frame
+        bandwidth_frame = ttk.Frame(options_frame)
+        bandwidth_frame.grid(row=4, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        bandwidth_label = ttk.Label(bandwidth_frame, text="Bandwidth limit (MB/s, 0 = unlimited):")
+        bandwidth_label.pack(side=tk.LEFT, padx=5)
+        
+        self.bandwidth_entry = ttk.Entry(bandwidth_frame, width=6)
+        self.bandwidth_entry.pack(side=tk.LEFT, padx=5)
+        self.bandwidth_entry.insert(0, "0")
+        
+        self.adaptive_concurrency = tk.BooleanVar(value=False)
+        adaptive_check = ttk.Checkbutton(bandwidth_frame, text="Adaptive concurrency, up to",
+                                         variable=self.adaptive_concurrency)
+        adaptive_check.pack(side=tk.LEFT, padx=5)
+        
+        self.max_workers_entry = ttk.Entry(bandwidth_frame, width=5)
+        self.max_workers_entry.pack(side=tk.LEFT, padx=5)
+        self.max_workers_entry.insert(0, str(DEFAULT_OPTIONS["max_workers"]))
+        
+        # Post-processing frame
+        post_frame = ttk.Frame(options_frame)
+        post_frame.grid(row=5, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        self.background_merge = tk.BooleanVar(value=DEFAULT_OPTIONS["postprocess"])
+        merge_check = ttk.Checkbutton(post_frame, text="Merge best-quality streams in the background",
+                                      variable=self.background_merge)
+        merge_check.pack(side=tk.LEFT, padx=5)
+        
+        self.write_checksums = tk.BooleanVar(value=DEFAULT_OPTIONS["checksums"])
+        checksums_check = ttk.Checkbutton(post_frame, text="SHA-256 checksums", variable=self.write_checksums)
+        checksums_check.pack(side=tk.LEFT, padx=5)
+        
+        # Reflinks where the file system has them, hardlinks otherwise
+        self.deduplicate = tk.BooleanVar(value=DEFAULT_OPTIONS["dedup"] != DEDUP_OFF)
+        dedup_check = ttk.Checkbutton(post_frame, text="Link duplicate videos", variable=self.deduplicate)
+        dedup_check.pack(side=tk.LEFT, padx=5)
+        
+        thumb_width_label = ttk.Label(post_frame, text="Thumbnail width (px, 0 = original):")
+        thumb_width_label.pack(side=tk.LEFT, padx=5)
+        
+        self.thumbnail_width_entry = ttk.Entry(post_frame, width=6)
+        self.thumbnail_width_entry.pack(side=tk.LEFT, padx=5)
+        self.thumbnail_width_entry.insert(0, str(DEFAULT_OPTIONS["thumbnail_width"]))
+        
+        # Staging and fragment concurrency frame
+        staging_frame = ttk.Frame(options_frame)
+        staging_frame.grid(row=6, column=0, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        staging_label = ttk.Label(staging_frame, text="Staging directory (empty = download in place):")
+        staging_label.pack(side=tk.LEFT, padx=5)
+        
+        self.staging_entry = ttk.Entry(staging_frame, width=30)
+        self.staging_entry.pack(side=tk.LEFT, padx=5)
+        self.staging_entry.insert(0, DEFAULT_OPTIONS["staging_path"])
+        
+        staging_browse_button = ttk.Button(staging_frame, text="Browse", command=self.browse_staging_path)
+        staging_browse_button.pack(side=tk.LEFT, padx=5)
+        
+        fragments_label = ttk.Label(staging_frame, text="Fragments per video (0 = auto):")
+        fragments_label.pack(side=tk.LEFT, padx=5)
+        
+        self.fragments_entry = ttk.Entry(staging_frame, width=5)
+        self.fragments_entry.pack(side=tk.LEFT, padx=5)
+        self.fragments_entry.insert(0, str(DEFAULT_OPTIONS["fragments"]))
+        
+        self.controller_label = ttk.Label(options_frame, text="")
+        self.controller_label.grid(row=7, column=0, columnspan=2, sticky=tk.W, padx=5)
+        
+        # Action buttons
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(fill=tk.X, pady=10)
+        
+        self.login_button = ttk.Button(buttons_frame, text="Login to YouTube", command=self.handle_login)
+        self.login_button.pack(side=tk.LEFT, padx=5)
+        
+        self.download_button = ttk.Button(buttons_frame, text="Download Channel", command=self.start_download)
+        self.download_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.metadata_button = ttk.Button(buttons_frame, text="Download Metadata Only", command=self.start_metadata)
+        self.metadata_button.pack(side=tk.RIGHT, padx=5)
+        
+        clear_cookies_button = ttk.Button(buttons_frame, text="Clear Cookies", command=self.clear_cookies)
+        clear_cookies_button.pack(side=tk.RIGHT, padx=5)
+        
+        stats_button = ttk.Button(buttons_frame, text="Performance Stats", command=self.show_stats)
+        stats_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.dedup_button = ttk.Button(buttons_frame, text="Deduplicate Library", command=self.start_dedup)
+        self.dedup_button.pack(side=tk.RIGHT, padx=5)
+        
+        # Nút Save Cookies luôn hiển thị
+        self.save_button_frame = ttk.Frame(main_frame)
+        self.save_button_frame.pack(fill=tk.X, pady=5)
+        self.save_cookies_button = ttk.Button(self.save_button_frame, text="Save Cookies", command=self._save_cookies)
+        self.save_cookies_button.pack(pady=5)
+        
+        # Progress indicators
+        self.progress_var = tk.DoubleVar()
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill=tk.X, pady=10)
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, variable=self.progress_var, length=100, mode="indeterminate")
+        self.progress_bar.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.status_label = ttk.Label(progress_frame, text="Ready")
+        self.status_label.pack(anchor=tk.W, padx=5)
+        
+        self.metadata_label = ttk.Label(progress_frame, text="")
+        self.metadata_label.pack(anchor=tk.W, padx=5)
+        
+        # Output console (for messages)
+        console_frame = ttk.LabelFrame(main_frame, text="Console Output", padding=10)
+        console_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        self.console_text = tk.Text(console_frame, height=10, wrap=tk.WORD)
+        self.console_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(console_frame, command=self.console_text.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.console_text.config(yscrollcommand=scrollbar.set)
+        
+        # Color coding by level
+        self.console_text.tag_config("error", foreground="red")
+        self.console_text.tag_config("warning", foreground="orange")
+        
+        # Bảng danh sách video vừa tải
+        video_list_frame = ttk.LabelFrame(main_frame, text="Danh sách video vừa tải", padding=10)
+        video_list_frame.pack(fill=tk.BOTH, expand=False, pady=5)
+        library_bar = ttk.Frame(video_list_frame)
+        library_bar.pack(fill=tk.X)
+        
+        search_label = ttk.Label(library_bar, text="Tìm:")
+        search_label.pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self._schedule_search())
+        search_entry = ttk.Entry(library_bar, textvariable=self.search_var, width=30)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        
+        self.last_run_only = tk.BooleanVar(value=False)
+        last_run_check = ttk.Checkbutton(library_bar, text="Chỉ hiện video của lần tải gần nhất",
+                                         variable=self.last_run_only, command=self._update_video_tree)
+        last_run_check.pack(side=tk.LEFT, padx=5)
+        
+        self.next_page_button = ttk.Button(library_bar, text="▶", width=3, command=self._next_library_page)
+        self.next_page_button.pack(side=tk.RIGHT)
+        self.page_label = ttk.Label(library_bar, text="")
+        self.page_label.pack(side=tk.RIGHT, padx=5)
+        self.prev_page_button = ttk.Button(library_bar, text="◀", width=3, command=self._prev_library_page)
+        self.prev_page_button.pack(side=tk.RIGHT)
+        
+        self.video_tree = ttk.Treeview(video_list_frame, columns=[column for column, _, _ in LIBRARY_COLUMNS],
+                                       show="headings", height=6)
+        for column, heading, width in LIBRARY_COLUMNS:
+            self.video_tree.heading(column, text=heading, command=lambda column=column: self._sort_library(column))
+            self.video_tree.column(column, width=width, stretch=column == "title")
+        self.video_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # Set initial state
+        self.root.after(CONSOLE_FLUSH_MS, self._flush_console)
+        self.update_login_status()
+        
+    def update_login_status(self):
+        """Check the saved cookies in the background and update the login button"""
+        threading.Thread(target=self._load_login_status, daemon=True).start()
+        
+    def _load_login_status(self):
+        """Unpickle the cookie file and check its expiry off the UI thread"""
+        cookies_found = False
+        expired = []
+        if os.path.exists(self.cookie_path):
+            try:
+                with open(self.cookie_path, 'rb') as f:
+                    cookies = pickle.load(f)
+                    if cookies:
+                        cookies_found = True
+                        self.log("Login cookies found and loaded")
+            except Exception as e:
+                self.log(f"Error loading cookies: {e}", "error")
+        if cookies_found:
+            # Reads the cookie store and may rewrite cookies.txt, too slow for the UI thread
+            expired, _ = self.engine.check_cookies()
+                
+        def _update():
+            self.cookies_loaded = cookies_found
+            self.cookies_expired = bool(expired)
+            if cookies_found:
+                self.login_button.config(text="Re-Login (Cookies Found)")
+            else:
+                self.login_button.config(text="Login to YouTube")
+                
+        self.root.after(0, _update)
+        
+    def check_dependencies(self):
+        """Check if required dependencies are installed"""
+        try:
+            # Check yt-dlp
+            version = self.engine.check_ytdlp()
+            if version:
+                self.log(f"yt-dlp version {version} found")
+            else:
+                self.log("yt-dlp not found! Please install it with: pip install yt-dlp", "error")
+                # Runs on a worker thread, so the dialog is shown by the UI thread
+                self.root.after(0, lambda: messagebox.showerror("Dependency Error", "yt-dlp not found! Please install it with: pip install yt-dlp"))
+                
+            # Check if Chrome is installed
+            if platform.system() == "Windows":
+                chrome_paths = [
+                    os.path.expandvars("%ProgramFiles%\\Google\\Chrome\\Application\\chrome.exe"),
+                    os.path.expandvars("%ProgramFiles(x86)%\\Google\\Chrome\\Application\\chrome.exe"),
+                    os.path.expandvars("%LocalAppData%\\Google\\Chrome\\Application\\chrome.exe")
+                ]
+                chrome_found = any(os.path.exists(path) for path in chrome_paths)
+            elif platform.system() == "Darwin":  # macOS
+                chrome_paths = [
+                    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+                    os.path.expanduser("~/Applications/Google Chrome.app/Contents/MacOS/Google Chrome")
+                ]
+                chrome_found = any(os.path.exists(path) for path in chrome_paths)
+            else:  # Linux
+                chrome_found = shutil.which("google-chrome") is not None
+                
+            if chrome_found:
+                self.log("Google Chrome found")
+            else:
+                self.log("Google Chrome not found! The app will try to use Chromium or other compatible browsers.", "warning")
+        except Exception as e:
+            self.log(f"Error checking dependencies: {e}", "error")
+            
+    def browse_path(self):
+        """Open dialog to choose download path"""
+        path = filedialog.askdirectory()
+        if path:
+            self.download_path = path
+            self.path_entry.delete(0, tk.END)
+            self.path_entry.insert(0, path)
+            self.log(f"Download path set to: {path}")
+            
+    def browse_staging_path(self):
+        """Open dialog to choose the local staging directory"""
+        path = filedialog.askdirectory()
+        if path:
+            self.staging_entry.delete(0, tk.END)
+            self.staging_entry.insert(0, path)
+            self.log(f"Staging directory set to: {path}")
+            
+    def handle_login(self):
+        """Open browser for YouTube login and save cookies"""
+        self.log("Starting login process...")
+        threading.Thread(target=self._login_process, daemon=True).start()
+        
+    def show_save_cookies_button(self):
+        """Không cần làm gì nữa, nút luôn hiển thị"""
+        self.log("Đã gọi show_save_cookies_button")
+        
+    def _login_process(self):
+        """Handle the browser login process in a separate thread"""
+        try:
+            self.update_status("Opening browser for login...", start_progress=True)
+            
+            # Selenium is only needed here, so it is imported on first login instead of at startup
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service
+            from selenium.webdriver.chrome.options import Options
+            from webdriver_manager.chrome import ChromeDriverManager
+            
+            # Setup Chrome options
+            chrome_options = Options()
+            chrome_options.add_argument("--start-maximized")
+            chrome_options.add_argument("--disable-infobars")
+            chrome_options.add_argument("--disable-extensions")
+            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+            chrome_options.add_experimental_option("useAutomationExtension", False)
+            chrome_options.add_experimental_option("detach", True)  # Detach browser from driver
+            
+            # Create and start browser
+            self.browser = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+            self.browser.get("https://www.youtube.com/")
+            
+            self.update_status("Please login to YouTube in the opened browser...")
+            self.log("Browser opened. Please login to your YouTube account.")
+            self.log("IMPORTANT: After login, click the 'Save Cookies' button below BEFORE closing the browser.")
+            
+            # Thay vì tạo nút trực tiếp, gọi qua main thread
+            self.root.after(0, self.show_save_cookies_button)
+            
+        except Exception as e:
+            self.log(f"Error during login process: {e}", "error")
+            self.update_status(f"Login failed: {str(e)}", stop_progress=True)
+            
+            # Remove the save cookies button if it exists
+            if hasattr(self, 'save_cookies_button'):
+                self.save_button_frame.destroy()
+                del self.save_cookies_button
+                del self.save_button_frame
+                
+            # Make sure the browser is closed on error
+            if self.browser:
+                try:
+                    self.browser.quit()
+                except:
+                    pass
+                    
+    def _save_cookies(self):
+        """Save cookies from the current browser session"""
+        try:
+            if not self.browser:
+                self.log("Browser is not open. Cannot save cookies.", "error")
+                messagebox.showerror("Error", "Browser is not open. Please login first.")
+                return
+            self.log("Saving cookies...")
+            self.update_status("Saving cookies...", stop_progress=False)
+            # Save cookies
+            cookies = self.browser.get_cookies()
+            os.makedirs(os.path.dirname(self.cookie_path), exist_ok=True)
+            with open(self.cookie_path, 'wb') as f:
+                pickle.dump(cookies, f)
+            self.log("Cookies saved successfully!")
+            retried = self.index.reset_needs_login()
+            if retried:
+                self.log(f"{retried} videos that needed a login will be tried again on the next sync")
+            self.cookies_loaded = True
+            self.update_login_status()
+            self.update_status("Login successful", stop_progress=True)
+            # Show a confirmation message
+            messagebox.showinfo("Success", "Cookies saved successfully! You can now close the browser.")
+        except Exception as e:
+            self.log(f"Error saving cookies: {e}", "error")
+            self.update_status(f"Failed to save cookies: {str(e)}", stop_progress=True)
+    
+    def clear_cookies(self):
+        """Clear saved cookies"""
+        if os.path.exists(self.cookie_path):
+            try:
+                os.remove(self.cookie_path)
+                self.engine.cookies.invalidate()
+                self.log("Cookies cleared successfully")
+                self.cookies_loaded = False
+                self.update_login_status()
+            except Exception as e:
+                self.log(f"Error clearing cookies: {e}", "error")
+        else:
+            self.log("No cookies found to clear")
+            
+    def start_download(self):
+        """Start the download process for the YouTube channel"""
+        url = self._confirm_channel_url()
+        if not url:
+            return
+        if self.engine.is_syncing(url):
+            # Resumed at startup or started before, its videos are downloading already
+            messagebox.showinfo("Info", "This channel is already being downloaded")
+            return
+            
+        # Widgets may only be read from the UI thread, so snapshot them here
+        options = self._collect_options()
+        threading.Thread(target=self._download_process, args=(url, options), daemon=True).start()
+        
+    def start_metadata(self):
+        """Fetch thumbnails, descriptions and subtitles of the channel without the videos"""
+        url = self._confirm_channel_url()
+        if not url:
+            return
+            
+        options = self._collect_options()
+        threading.Thread(target=self._metadata_process, args=(url, options), daemon=True).start()
+        
+    def start_dedup(self):
+        """Hash the download folder and link identical videos, in a separate thread"""
+        download_path = self._collect_options()["download_path"]
+        if not os.path.isdir(download_path):
+            messagebox.showerror("Error", f"Download folder not found: {download_path}")
+            return
+        self.dedup_button.config(state=tk.DISABLED)
+        threading.Thread(target=self._dedup_process, args=(download_path,), daemon=True).start()
+        
+    def _dedup_process(self, download_path):
+        try:
+            self.log(f"Deduplicating {download_path}...")
+            files, linked, freed = self.engine.dedup.scan(download_path, DEDUP_REFLINK)
+            self.log(f"Deduplication: {files} videos checked, {linked} linked, {format_bytes(freed)} freed")
+            # File names are unchanged, the table only picks up new timestamps
+            self.root.after(0, lambda: self.show_downloaded_videos(download_path))
+        except Exception as e:
+            self.log(f"Error during deduplication: {e}", "error")
+        finally:
+            self.root.after(0, lambda: self.dedup_button.config(state=tk.NORMAL))
+            
+    def _confirm_channel_url(self):
+        """Return the channel URL once the user has confirmed any login problems, or None"""
+        url = self.url_entry.get().strip()
+        if not url:
+            messagebox.showerror("Error", "Please enter a YouTube channel URL")
+            return None
+            
+        if not self.cookies_loaded and not messagebox.askyesno(
+            "No Login", 
+            "You haven't logged in to YouTube. Some videos might not be available without login. Continue anyway?"
+        ):
+            return None
+            
+        # From the background check of update_login_status; the sync itself checks again before downloading
+        if self.cookies_loaded:
+            if self.cookies_expired and not messagebox.askyesno(
+                "Login Expired",
+                "Your saved YouTube login has expired. Videos that need a login will fail. Continue anyway?"
+            ):
+                return None
+        return url
+        
+    def _collect_options(self):
+        """Read the download options from the widgets"""
+        download_path = self.path_entry.get().strip()
+        if not download_path:
+            download_path = self.download_path
+            
+        try:
+            limit = int(self.limit_entry.get())
+        except ValueError:
+            limit = 0
+            
+        try:
+            listing_ttl = float(self.listing_ttl_entry.get()) * 60
+        except ValueError:
+            listing_ttl = DEFAULT_OPTIONS["listing_ttl"]
+            
+        try:
+            workers = int(self.workers_entry.get())
+        except ValueError:
+            workers = DEFAULT_WORKERS
+            
+        try:
+            max_workers = int(self.max_workers_entry.get())
+        except ValueError:
+            max_workers = DEFAULT_OPTIONS["max_workers"]
+            
+        try:
+            bandwidth_limit = int(float(self.bandwidth_entry.get()) * 1024 * 1024)
+        except ValueError:
+            bandwidth_limit = 0
+            
+        try:
+            thumbnail_width = int(self.thumbnail_width_entry.get())
+        except ValueError:
+            thumbnail_width = DEFAULT_OPTIONS["thumbnail_width"]
+            
+        try:
+            fragments = int(self.fragments_entry.get())
+        except ValueError:
+            fragments = DEFAULT_OPTIONS["fragments"]
+            
+        return {
+            "download_path": download_path,
+            "thumbnails": self.download_thumbnails.get(),
+            "descriptions": self.download_descriptions.get(),
+            "subtitles": self.download_subtitles.get(),
+            "best_quality": self.best_quality.get(),
+            "limit": max(limit, 0),
+            "listing_ttl": max(listing_ttl, 0),
+            "workers": min(max(workers, 1), MAX_WORKERS),
+            "use_cookies": self.cookies_loaded,
+            "bandwidth_limit": max(bandwidth_limit, 0),
+            "adaptive": self.adaptive_concurrency.get(),
+            "max_workers": min(max(max_workers, workers, 1), MAX_WORKERS),
+            "backend": BACKEND_API if self.use_api_backend.get() else BACKEND_SUBPROCESS,
+            "postprocess": self.background_merge.get(),
+            "checksums": self.write_checksums.get(),
+            "thumbnail_width": max(thumbnail_width, 0),
+            "dedup": DEDUP_REFLINK if self.deduplicate.get() else DEDUP_OFF,
+            "staging_path": self.staging_entry.get().strip(),
+            "fragments": min(max(fragments, 0), MAX_FRAGMENTS),
+        }
+        
+    def _download_process(self, url, options):
+        """Execute the download process in a separate thread"""
+        try:
+            self.update_status("Checking channel for new videos...", start_progress=True)
+            # The Tk thread reads the set for the library view, so only the Tk thread changes it
+            self.root.after(0, self.last_run_files.clear)
+            self.engine.controller.configure(
+                workers=options["workers"],
+                max_workers=options["max_workers"] if options["adaptive"] else options["workers"],
+                bandwidth_limit=options["bandwidth_limit"],
+                adaptive=options["adaptive"]
+            )
+            
+            def on_start(tracker):
+                self.tracker = tracker
+                self.root.after(0, self._set_determinate_progress)
+                self.root.after(0, self._refresh_progress)
+                
+            def on_video_finished(video_id, success, file_path):
+                if file_path:
+                    self.root.after(0, self.last_run_files.add, os.path.abspath(file_path))
+                    
+            summary = self.engine.sync_channel(url, options, on_start=on_start, on_video_finished=on_video_finished)
+            self.tracker = None
+            
+            if summary["total"] == 0:
+                self.update_status("Channel is up to date", stop_progress=True)
+                return
+                
+            if summary["failed"] == 0:
+                self.update_status("Download completed successfully!", stop_progress=True)
+                self.log(f"Download completed successfully! ({summary['completed']} videos in {format_eta(summary['elapsed'])})")
+            else:
+                self.update_status(f"Download finished: {summary['failed']} of {summary['total']} videos failed", stop_progress=True)
+                self.log(f"{summary['failed']} of {summary['total']} videos failed to download", "error")
+                
+            # Hiển thị danh sách video vừa tải
+            self.root.after(0, lambda: self.show_downloaded_videos(options["download_path"]))
+                
+        except Exception as e:
+            self.tracker = None
+            self.log(f"Error during download: {e}", "error")
+            self.update_status(f"Download error: {str(e)}", stop_progress=True)
+            
+    def _metadata_process(self, url, options):
+        """Run the metadata-only pass in a separate thread, next to any video download"""
+        try:
+            self.log(f"Fetching metadata for {url}...")
+            
+            def on_start(tracker):
+                self.metadata_tracker = tracker
+                self.root.after(0, self._refresh_metadata_progress)
+                
+            summary = self.engine.fetch_metadata(url, options, on_start=on_start)
+            self.metadata_tracker = None
+            message = (f"Metadata: {summary['completed']} of {summary['total']} videos done"
+                       f" in {format_eta(summary['elapsed'])}")
+            if summary["failed"]:
+                message += f", {summary['failed']} failed"
+            self.log(message, "warning" if summary["failed"] else "info")
+            self.root.after(0, lambda: self.metadata_label.config(text=message))
+        except Exception as e:
+            self.metadata_tracker = None
+            self.log(f"Error fetching metadata: {e}", "error")
+            self.root.after(0, lambda: self.metadata_label.config(text=f"Metadata error: {e}"))
+            
+    def _refresh_metadata_progress(self):
+        """Show the progress of the metadata pass under the download progress"""
+        tracker = self.metadata_tracker
+        if tracker is None:
+            return
+        snapshot = tracker.snapshot()
+        finished = snapshot["completed"] + snapshot["failed"]
+        self.metadata_label.config(text=f"Metadata: {finished}/{snapshot['total']} videos, {snapshot['active']} active")
+        self.root.after(PROGRESS_REFRESH_MS, self._refresh_metadata_progress)
+        
+    def _resume_jobs(self):
+        """Resume the channel syncs that never finished, one after the other"""
+        jobs = self.engine.resumable_jobs()
+        if not jobs:
+            return
+        self.log(f"Resuming {len(jobs)} interrupted channel downloads")
+        for url, stored_options in jobs:
+            # Jobs keep the options they were started with
+            options = dict(DEFAULT_OPTIONS)
+            options.update(stored_options)
+            self.log(f"Resuming download of {url}")
+            self._download_process(url, options)
+            if self.engine.stopping:
+                return
+                
+    def on_close(self):
+        """Stop the yt-dlp processes before the window goes away"""
+        if self.tracker is not None:
+            self.log("Stopping downloads, they will resume on the next launch")
+            self.status_label.config(text="Stopping downloads...")
+            self.root.update_idletasks()
+        self.engine.shutdown()
+        if self.metrics_server:
+            self.metrics_server.close()
+        self.root.destroy()
+        
+    def show_stats(self):
+        """Open the per-video performance window, or raise it if it is open already"""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+            
+        window = tk.Toplevel(self.root)
+        window.title("Performance Stats")
+        window.geometry("820x420")
+        self.stats_window = window
+        
+        self.stats_summary_label = ttk.Label(window, text="", padding=5)
+        self.stats_summary_label.pack(anchor=tk.W)
+        
+        table_frame = ttk.Frame(window)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.stats_tree = ttk.Treeview(table_frame, columns=[key for key, _, _ in STATS_COLUMNS], show="headings")
+        for key, title, width in STATS_COLUMNS:
+            self.stats_tree.heading(key, text=title)
+            self.stats_tree.column(key, width=width, anchor=tk.W if key in ("video_id", "status") else tk.E)
+        self.stats_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(table_frame, command=self.stats_tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.stats_tree.config(yscrollcommand=scrollbar.set)
+        
+        actions_frame = ttk.Frame(window, padding=5)
+        actions_frame.pack(fill=tk.X)
+        ttk.Button(actions_frame, text="Export JSON/CSV", command=self.export_stats).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(actions_frame, text="Prometheus port:").pack(side=tk.LEFT, padx=5)
+        self.metrics_port_entry = ttk.Entry(actions_frame, width=6)
+        self.metrics_port_entry.pack(side=tk.LEFT, padx=5)
+        self.metrics_port_entry.insert(0, str(self.metrics_server.port) if self.metrics_server else "9470")
+        self.metrics_server_button = ttk.Button(actions_frame, command=self.toggle_metrics_server,
+                                                text="Stop endpoint" if self.metrics_server else "Start endpoint")
+        self.metrics_server_button.pack(side=tk.LEFT, padx=5)
+        
+        self._refresh_stats()
+        
+    def _refresh_stats(self):
+        """Redraw the stats table from the engine metrics while the window is open"""
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            self.stats_window = None
+            return
+            
+        summary = self.engine.metrics.summary()
+        phases = summary["phase_seconds"]
+        listing = sum(summary["listing_seconds"].values())
+        status = ", ".join(f"{count} {name}" for name, count in sorted(summary["status"].items())) or "no videos yet"
+        self.stats_summary_label.config(
+            text=f"{summary['videos']} videos ({status}) - {format_bytes(summary['bytes'])}, "
+                 f"avg {format_bytes(summary['avg_speed'])}/s, peak {format_bytes(summary['peak_speed'])}/s, "
+                 f"{summary['retries']} retries\nListing {listing:.1f}s, queued {phases['queued']:.1f}s, "
+                 f"download {phases['download']:.1f}s, merge {phases['postprocess']:.1f}s"
+        )
+        
+        rows = self.engine.metrics.rows()
+        existing = set(self.stats_tree.get_children())
+        for row in rows:
+            values = (
+                row["video_id"],
+                row["status"],
+                f"{row['queued']:.1f}",
+                f"{row['download']:.1f}",
+                f"{row['postprocess']:.1f}",
+                format_bytes(row["bytes"]),
+                f"{format_bytes(row['avg_speed'])}/s" if row["avg_speed"] else "",
+                f"{format_bytes(row['peak_speed'])}/s" if row["peak_speed"] else "",
+                row["retries"],
+            )
+            if row["video_id"] in existing:
+                self.stats_tree.item(row["video_id"], values=values)
+            else:
+                self.stats_tree.insert("", tk.END, iid=row["video_id"], values=values)
+                
+        self.stats_window.after(STATS_REFRESH_MS, self._refresh_stats)
+        
+    def export_stats(self):
+        """Save the per-video metrics as JSON or CSV"""
+        path = filedialog.asksaveasfilename(
+            parent=self.stats_window,
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")],
+            initialfile=f"youtube_downloader_stats_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        )
+        if not path:
+            return
+        try:
+            self.engine.metrics.export(path)
+            self.log(f"Performance stats saved to {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Cannot save stats: {e}", parent=self.stats_window)
+            
+    def toggle_metrics_server(self):
+        """Start or stop the local Prometheus endpoint"""
+        if self.metrics_server:
+            self.metrics_server.close()
+            self.metrics_server = None
+            self.metrics_server_button.config(text="Start endpoint")
+            self.log("Metrics endpoint stopped")
+            return
+            
+        try:
+            port = int(self.metrics_port_entry.get())
+            self.metrics_server = MetricsServer(self.engine.metrics, port)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", f"Cannot start the metrics endpoint: {e}", parent=self.stats_window)
+            return
+        self.metrics_server_button.config(text="Stop endpoint")
+        self.log(f"Serving metrics on http://127.0.0.1:{self.metrics_server.port}/metrics")
+        
+    def _refresh_progress(self):
+        """Show the tracker totals in the progress bar and status label"""
+        tracker = self.tracker
+        if tracker is None:
+            return
+            
+        snapshot = tracker.snapshot()
+        finished = snapshot["completed"] + snapshot["failed"]
+        self.progress_var.set(snapshot["percent"])
+        self.status_label.config(
+            text=f"Đang tải: {finished}/{snapshot['total']} videos, {snapshot['active']} active "
+                 f"({snapshot['percent']:.1f}%) - {format_bytes(snapshot['speed'])}/s, "
+                 f"ETA {format_eta(snapshot['eta'])}"
+        )
+        
+        state = self.engine.controller.state()
+        limit = format_bytes(state["bandwidth_limit"]) + "/s" if state["bandwidth_limit"] else "unlimited"
+        post_queued, post_running = self.engine.post.depths()
+        self.controller_label.config(
+            text=f"Downloads: {state['active']}/{state['target']} (max {state['max_workers']}), "
+                 f"{format_bytes(state['speed'])}/s of {limit} - {state['reason']} | "
+                 f"post-processing: {post_queued} queued, {post_running} running"
+                 + (f" | throttled, paused for {state['paused']:.0f} s" if state["paused"] else "")
+        )
+        self.root.after(PROGRESS_REFRESH_MS, self._refresh_progress)
+        
+    def _set_determinate_progress(self):
+        """Switch the progress bar from the spinner to a percentage bar"""
+        self.progress_bar.stop()
+        self.progress_bar.config(mode="determinate")
+        self.progress_var.set(0)
+        
+    def update_status(self, message, start_progress=False, stop_progress=True):
+        """Update the status display"""
+        def _update():
+            self.status_label.config(text=message)
+            
+            if start_progress:
+                self.progress_bar.config(mode="indeterminate")
+                self.progress_bar.start(10)
+            elif stop_progress:
+                self.progress_bar.stop()
+                self.progress_var.set(100)  # Show as completed
+                
+        self.root.after(0, _update)
+        
+    def update_progress(self, value):
+        """Update the progress bar with a percentage value"""
+        def _update():
+            self.progress_var.set(value)
+            
+        self.root.after(0, _update)
+        
+    def log(self, message, level="info"):
+        """Add a message to the log"""
+        # Log to file as well
+        if level == "error":
+            logging.error(message)
+        elif level == "warning":
+            logging.warning(message)
+        else:
+            logging.info(message)
+            
+        # deque.append is thread-safe; the UI thread picks the line up on its next flush
+        self._log_buffer.append((message, level))
+        
+    def _flush_console(self):
+        """Move buffered log lines into the console widget in one batch"""
+        try:
+            batch = []
+            while True:
+                try:
+                    batch.append(self._log_buffer.popleft())
+                except IndexError:
+                    break
+                    
+            if batch:
+                # Consecutive lines with the same level are inserted with a single call
+                chunk = []
+                chunk_level = batch[0][1]
+                for message, level in batch:
+                    if level != chunk_level:
+                        self._insert_console_chunk(chunk, chunk_level)
+                        chunk = []
+                        chunk_level = level
+                    chunk.append(message)
+                self._insert_console_chunk(chunk, chunk_level)
+                
+                # Trim the oldest lines past the limit
+                line_count = int(self.console_text.index("end-1c").split(".")[0])
+                if line_count > self.console_max_lines:
+                    self.console_text.delete("1.0", f"{line_count - self.console_max_lines + 1}.0")
+                self.console_text.see(tk.END)  # Scroll to end
+        finally:
+            self.root.after(CONSOLE_FLUSH_MS, self._flush_console)
+            
+    def _insert_console_chunk(self, messages, level):
+        """Insert a run of lines that share the same level"""
+        tags = (level,) if level in ("error", "warning") else ()
+        self.console_text.insert(tk.END, "\n".join(messages) + "\n", tags)
+        
+    def show_downloaded_videos(self, download_path):
+        """Quét thư mục download trên thread riêng và cập nhật bảng video"""
+        threading.Thread(target=self._scan_library, args=(download_path,), daemon=True).start()
+        
+    def _scan_library(self, download_path):
+        """Run the incremental library scan and index update off the UI thread"""
+        with self._scan_lock:
+            try:
+                added, removed, changed = self.scanner.scan(download_path)
+                files = dict(self.scanner.files)
+                self.library.sync(download_path, files)
+            except Exception as e:
+                self.log(f"Error scanning download folder: {e}", "error")
+                return
+        if added or removed or changed:
+            self.log(f"Library scan: {len(added)} new, {len(changed)} changed, {len(removed)} removed files")
+            
+        def _update():
+            self._library_root = download_path
+            self._update_video_tree()
+            
+        self.root.after(0, _update)
+        
+    def _schedule_search(self):
+        """Run the search once typing pauses"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DELAY_MS, self._update_video_tree)
+        
+    def _sort_library(self, column):
+        """Sort by a column, a second click on the same column reverses the order"""
+        order, descending = self._library_sort
+        self._library_sort = (column, not descending if column == order else column in ("mtime", "upload_date"))
+        self._update_video_tree()
+        
+    def _library_query(self):
+        """Return the arguments shared by the count and page queries"""
+        only_paths = self.last_run_files if self.last_run_only.get() else None
+        return self._library_root, self.search_var.get(), only_paths
+        
+    def _update_video_tree(self):
+        """Count the matching videos and show the first page"""
+        self._search_job = None
+        if self._library_root is None:
+            return
+        self._library_total = self.library.count(*self._library_query())
+        self._page_keys = [None]
+        self._load_library_page()
+        
+    def _next_library_page(self):
+        if self._next_page_key is not None:
+            self._page_keys.append(self._next_page_key)
+            self._load_library_page()
+            
+    def _prev_library_page(self):
+        if len(self._page_keys) > 1:
+            self._page_keys.pop()
+            self._load_library_page()
+            
+    def _load_library_page(self):
+        """Replace the table rows with the current page"""
+        root, text, only_paths = self._library_query()
+        order, descending = self._library_sort
+        rows = self.library.page(root, text, only_paths, order, descending,
+                                 after=self._page_keys[-1], limit=LIBRARY_PAGE_SIZE)
+        
+        self.video_tree.delete(*self.video_tree.get_children())
+        for row in rows:
+            self.video_tree.insert("", "end", iid=row["file_path"], values=(
+                row["title"],
+                row["channel"],
+                row["upload_date"],
+                format_eta(row["duration"]) if row["duration"] else "",
+                format_bytes(row["file_size"]),
+                datetime.datetime.fromtimestamp(row["mtime"]).strftime("%Y-%m-%d %H:%M:%S"),
+            ))
+            
+        self._next_page_key = rows[-1]["key"] if len(rows) == LIBRARY_PAGE_SIZE else None
+        page = len(self._page_keys)
+        pages = max((self._library_total + LIBRARY_PAGE_SIZE - 1) // LIBRARY_PAGE_SIZE, 1)
+        self.page_label.config(text=f"Trang {page}/{pages} ({self._library_total} video)")
+        self.prev_page_button.config(state=tk.NORMAL if page > 1 else tk.DISABLED)
+        self.next_page_button.config(state=tk.NORMAL if self._next_page_key is not None else tk.DISABLED)
+        
+    def run(self):
+        """Start the application"""
+        # Pick up channel syncs that a crash, reboot or window close cut short.
+        # Started here rather than in __init__, so building the window never downloads anything.
+        threading.Thread(target=self._resume_jobs, daemon=True).start()
+        self.root.mainloop()
+
+def main():
+    """Start the GUI"""
+    log_pipeline = setup_logging(default_log_path())
+    try:
+        app = YouTubeDownloader()
+        app.run()
+    finally:
+        log_pipeline.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Library scanner and index
+- Walks the download folder with os.scandir and reports only what changed
+- Directory mtimes are cached, so folders whose entries didn't change are not listed again
+- The videos found are kept in a SQLite table with a full-text index (title, channel, path), filled
+  from yt-dlp's .info.json files, and read one page at a time by the library view
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm")
+
+class LibraryScanner:
+    """Incremental scanner for the video files under one download folder"""
+
+    def __init__(self, extensions=VIDEO_EXTENSIONS):
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.root = None
+        self.files = {}
+        # directory -> (st_mtime_ns, {file path: mtime}, [subdirectory paths])
+        self._dirs = {}
+
+    def scan(self, root):
+        """Walk `root` and return (added, removed, changed) compared to the previous scan
+
+        added and changed map file paths to mtimes, removed is a set of paths.
+        Must not be called from two threads at once.
+        """
+        root = os.path.abspath(root)
+        if root != self.root:
+            # A different library, nothing in the cache applies
+            self.root = root
+            self.files = {}
+            self._dirs = {}
+
+        dirs = {}
+        files = {}
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = self._dirs.get(path)
+            if cached and cached[0] == mtime_ns:
+                # No entry was added, removed or renamed in this folder
+                dir_files, subdirs = cached[1], cached[2]
+            else:
+                dir_files, subdirs = self._list_dir(path)
+
+            dirs[path] = (mtime_ns, dir_files, subdirs)
+            files.update(dir_files)
+            stack.extend(subdirs)
+
+        added = {path: mtime for path, mtime in files.items() if path not in self.files}
+        changed = {path: mtime for path, mtime in files.items() if path in self.files and self.files[path] != mtime}
+        removed = set(self.files) - set(files)
+
+        self._dirs = dirs
+        self.files = files
+        return added, removed, changed
+
+    def _list_dir(self, path):
+        """List the matching files and the subdirectories of one folder"""
+        dir_files = {}
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(self.extensions):
+                            dir_files[entry.path] = entry.stat().st_mtime
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return dir_files, subdirs
+
+LIBRARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS library (
+    file_path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    video_id TEXT,
+    title TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    upload_date TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    file_size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS library_mtime ON library (root, mtime);
+CREATE INDEX IF NOT EXISTS library_upload_date ON library (root, upload_date);
+CREATE INDEX IF NOT EXISTS library_title ON library (root, title);
+CREATE INDEX IF NOT EXISTS library_channel ON library (root, channel);
+CREATE INDEX IF NOT EXISTS library_duration ON library (root, duration);
+CREATE INDEX IF NOT EXISTS library_file_size ON library (root, file_size);
+"""
+# Full-text index over the table above, kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(
+    title, channel, file_path, content='library', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS library_ai AFTER INSERT ON library BEGIN
+    INSERT INTO library_fts (rowid, title, channel, file_path) VALUES (new.rowid, new.title, new.channel, new.file_path);
+END;
+CREATE TRIGGER IF NOT EXISTS library_ad AFTER DELETE ON library BEGIN
+    INSERT INTO library_fts (library_fts, rowid, title, channel, file_path)
+    VALUES ('delete', old.rowid, old.title, old.channel, old.file_path);
+END;
+CREATE TRIGGER IF NOT EXISTS library_au AFTER UPDATE ON library BEGIN
+    INSERT INTO library_fts (library_fts, rowid, title, channel, file_path)
+    VALUES ('delete', old.rowid, old.title, old.channel, old.file_path);
+    INSERT INTO library_fts (rowid, title, channel, file_path) VALUES (new.rowid, new.title, new.channel, new.file_path);
+END;
+"""
+# Columns the table can be sorted by
+SORT_COLUMNS = ("title", "channel", "upload_date", "duration", "file_size", "mtime")
+# Rows written per transaction while a large library is indexed
+WRITE_BATCH = 500
+# "2024-01-31 - Title.mp4", the name the output template gives every download
+FILE_NAME = re.compile(r"^(?P<date>\d{4}-\d{2}-\d{2}) - (?P<title>.+)$")
+
+def read_video_info(path):
+    """Return the library fields of a video file, from its .info.json or else from its name"""
+    stem = os.path.splitext(path)[0]
+    info = {}
+    try:
+        with open(stem + ".info.json", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if not isinstance(info, dict):
+        info = {}
+
+    match = FILE_NAME.match(os.path.basename(stem))
+    upload_date = info.get("upload_date")
+    if upload_date and len(upload_date) == 8:
+        upload_date = f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}"
+    elif match:
+        upload_date = match.group("date")
+    duration = info.get("duration")
+    # Sort columns are never NULL, unknown values sort first
+    return {
+        "video_id": info.get("id"),
+        "title": info.get("title") or (match.group("title") if match else os.path.basename(stem)),
+        # Downloads are grouped in one folder per uploader
+        "channel": info.get("channel") or info.get("uploader") or os.path.basename(os.path.dirname(path)),
+        "upload_date": upload_date or "",
+        "duration": int(duration) if isinstance(duration, (int, float)) else 0,
+    }
+
+def fts_query(text):
+    """Turn search box text into an FTS5 query: every word must match, as a prefix"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+class LibraryIndex:
+    """Searchable SQLite table of the videos on disk, read one page at a time by the library view
+
+    Rows belong to the library folder (root) they were scanned from. Every sort column has a
+    (root, column) index, and pages continue from the last row of the previous page instead of
+    using OFFSET, so a page costs the same at the start and at the end of a large library.
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Shared by the scan thread and the UI thread, access goes through self._lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(LIBRARY_SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5, searches fall back to LIKE
+            self.full_text = False
+        self._conn.commit()
+
+    def sync(self, root, files, should_stop=None):
+        """Make the rows of root match `files` ({path: mtime} from LibraryScanner)
+
+        Only new and modified files are read again. Returns (updated, removed) counts.
+        """
+        root = os.path.abspath(root)
+        with self._lock:
+            stored = dict(self._conn.execute("SELECT file_path, mtime FROM library WHERE root = ?", (root,)).fetchall())
+        removed = [path for path in stored if path not in files]
+        changed = [path for path, mtime in files.items() if stored.get(path) != mtime]
+
+        if removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM library WHERE file_path = ?", [(path,) for path in removed])
+                self._conn.commit()
+
+        for start in range(0, len(changed), WRITE_BATCH):
+            if should_stop and should_stop():
+                break
+            rows = []
+            for path in changed[start:start + WRITE_BATCH]:
+                try:
+                    file_size = os.path.getsize(path)
+                except OSError:
+                    continue
+                info = read_video_info(path)
+                rows.append((path, root, info["video_id"], info["title"], info["channel"], info["upload_date"],
+                             info["duration"], file_size, files[path]))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT INTO library (file_path, root, video_id, title, channel, upload_date, duration, file_size, "
+                    "mtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(file_path) DO UPDATE SET "
+                    "root = excluded.root, video_id = excluded.video_id, title = excluded.title, "
+                    "channel = excluded.channel, upload_date = excluded.upload_date, duration = excluded.duration, "
+                    "file_size = excluded.file_size, mtime = excluded.mtime",
+                    rows
+                )
+                self._conn.commit()
+        return len(changed), len(removed)
+
+    def _where(self, root, text, only_paths):
+        """Return the FROM source, WHERE clauses and parameters of a library query"""
+        source = "library"
+        clauses = ["library.root = ?"]
+        params = [os.path.abspath(root)]
+        text = text.strip()
+        query = fts_query(text) if self.full_text else ""
+        if query:
+            # Start from the full-text matches, the cost follows the number of hits instead of the library size
+            source = "library_fts CROSS JOIN library ON library.rowid = library_fts.rowid"
+            clauses.insert(0, "library_fts MATCH ?")
+            params.insert(0, query)
+        elif text and not self.full_text:
+            for word in text.split():
+                clauses.append("(library.title LIKE ? OR library.channel LIKE ? OR library.file_path LIKE ?)")
+                params.extend([f"%{word}%"] * 3)
+        if only_paths is not None:
+            # One parameter for any number of paths
+            clauses.append("library.file_path IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(only_paths)))
+        return source, clauses, params
+
+    def count(self, root, text="", only_paths=None):
+        """Number of videos in root matching the search text"""
+        source, clauses, params = self._where(root, text, only_paths)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {source} WHERE {' AND '.join(clauses)}", params
+            ).fetchone()[0]
+
+    def page(self, root, text="", only_paths=None, order="mtime", descending=True, after=None, limit=100):
+        """Return one page of matching rows as dicts
+
+        after is the "key" of the last row of the previous page, None for the first page.
+        """
+        if order not in SORT_COLUMNS:
+            order = "mtime"
+        source, clauses, params = self._where(root, text, only_paths)
+        if after is not None:
+            clauses.append(f"(library.{order}, library.rowid) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        direction = "DESC" if descending else "ASC"
+        columns = ", ".join(f"library.{column}" for column in (
+            "rowid", "file_path", "video_id", "title", "channel", "upload_date", "duration", "file_size", "mtime"))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {columns} FROM {source} WHERE {' AND '.join(clauses)} "
+                f"ORDER BY library.{order} {direction}, library.rowid {direction} LIMIT ?",
+                params + [limit]
+            )
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["key"] = (row[order], row.pop("rowid"))
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,190 @@
+"""
+Log pipeline
+- Loggers only put records on a bounded queue, a writer thread formats them and does the file and
+  console I/O, so a slow disk or a stalled stdout never blocks a download thread
+- The log file rotates by size and age, rotated files are gzip-compressed and only a few are kept
+- Bursts of similar lines (progress, fragment retries) are rate-limited per level, with a count of
+  what was dropped; warnings and errors always get through
+- The file goes to ~/.youtube_downloader_logs unless YOUTUBE_DOWNLOADER_LOG or --log-file says otherwise
+"""
+
+import os
+import re
+import sys
+import gzip
+import time
+import queue
+import shutil
+import logging
+import logging.handlers
+import threading
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_PATH_ENV = "YOUTUBE_DOWNLOADER_LOG"
+DEFAULT_LOG_PATH = os.path.join(os.path.expanduser("~"), ".youtube_downloader_logs", "youtube_downloader.log")
+MAX_LOG_BYTES = 10 * 1024 * 1024
+MAX_LOG_AGE = 24 * 3600
+LOG_BACKUPS = 5
+# Records waiting for the writer thread; more than this are dropped rather than blocking the caller
+LOG_QUEUE_SIZE = 10000
+# Similar lines let through per second, by level; levels not listed are never limited
+DEFAULT_RATES = {logging.DEBUG: 5, logging.INFO: 20}
+# Numbers (percentages, sizes, counters) don't make two lines different
+NUMBERS = re.compile(r"\d+(?:\.\d+)?")
+
+def default_log_path():
+    return os.environ.get(LOG_PATH_ENV) or DEFAULT_LOG_PATH
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+class RotatingLogFile(logging.handlers.RotatingFileHandler):
+    """Size- and age-based rotation with gzip-compressed backups (name.log.1.gz, name.log.2.gz, ...)"""
+
+    def __init__(self, path, max_bytes=MAX_LOG_BYTES, max_age=MAX_LOG_AGE, backups=LOG_BACKUPS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        super().__init__(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+        self.max_age = max_age
+        try:
+            # A file left by an earlier run counts from its last write
+            self.started_at = os.path.getmtime(path)
+        except OSError:
+            self.started_at = time.time()
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() - self.started_at >= self.max_age:
+            try:
+                if os.path.getsize(self.baseFilename) > 0:
+                    return True
+            except OSError:
+                pass
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.started_at = time.time()
+
+class RateLimitFilter(logging.Filter):
+    """Drops similar lines past a per-level rate and notes how many were dropped"""
+
+    def __init__(self, rates=None, window=1.0):
+        super().__init__()
+        self.rates = DEFAULT_RATES if rates is None else rates
+        self.window = window
+        self._lock = threading.Lock()
+        # (level, line shape) -> [window start, lines let through, lines dropped, last dropped record]
+        self._buckets = {}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        if not rate:
+            return True
+        key = (record.levelno, NUMBERS.sub("#", str(record.msg))[:120])
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window:
+                dropped = bucket[2] if bucket else 0
+                if len(self._buckets) > 10000:
+                    # Lines that never repeat would otherwise pile up here
+                    self._buckets.clear()
+                self._buckets[key] = [now, 1, 0, None]
+            elif bucket[1] < rate:
+                bucket[1] += 1
+                return True
+            else:
+                bucket[2] += 1
+                bucket[3] = record
+                return False
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} similar lines suppressed)"
+        return True
+
+    def flush(self):
+        """Return the last dropped line of every burst not reported yet, with its count
+
+        A burst is otherwise only reported by the next similar line, which never comes at the end of a run.
+        """
+        records = []
+        with self._lock:
+            for bucket in self._buckets.values():
+                if bucket[2]:
+                    record = bucket[3]
+                    record.msg = f"{record.msg} ({bucket[2]} similar lines suppressed)"
+                    records.append(record)
+                    bucket[2], bucket[3] = 0, None
+        return records
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of blocking"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogWriter(logging.handlers.QueueListener):
+    """The writer thread; waits for room for its stop sentinel instead of failing on a full queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class LogPipeline:
+    """Root logger -> rate limit -> queue -> writer thread -> rotating file and console"""
+
+    def __init__(self, log_path=None, level=logging.INFO, stream=None, rates=None,
+                 max_bytes=MAX_LOG_BYTES, max_age=MAX_LOG_AGE, backups=LOG_BACKUPS):
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+        self.log_path = log_path
+        if log_path:
+            file_handler = RotatingLogFile(log_path, max_bytes, max_age, backups)
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        if stream is not None:
+            stream_handler = logging.StreamHandler(stream)
+            stream_handler.setFormatter(formatter)
+            handlers.append(stream_handler)
+
+        self.queue = queue.Queue(LOG_QUEUE_SIZE)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.rate_limit = RateLimitFilter(rates)
+        self.handler.addFilter(self.rate_limit)
+        self.listener = LogWriter(self.queue, *handlers, respect_handler_level=True)
+        self.handlers = handlers
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        self.listener.start()
+        self.running = True
+
+    def stop(self):
+        """Write out what is queued and close the files"""
+        if not self.running:
+            return
+        self.running = False
+        logging.getLogger().removeHandler(self.handler)
+        # emit() skips the filter, so the summaries aren't rate-limited themselves
+        for record in self.rate_limit.flush():
+            self.handler.emit(record)
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+        if self.handler.dropped:
+            sys.stderr.write(f"{self.handler.dropped} log records were dropped because the log queue was full\n")
+
+def setup_logging(log_path=None, level=logging.INFO, console=True, **kwargs):
+    """Route the logging module through a LogPipeline and return it; stop() it before exiting"""
+    return LogPipeline(log_path, level, sys.stderr if console else None, **kwargs)
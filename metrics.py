@@ -0,0 +1,265 @@
+"""
+Run metrics
+- Per-video phase timings (queued, download, post-processing), bytes, average/peak speed, retries and status
+- Per-channel listing time
+- Exported as JSON or CSV, and as Prometheus text on an optional local HTTP endpoint
+"""
+
+import csv
+import json
+import time
+import threading
+
+PHASES = ("queued", "download", "postprocess")
+CSV_FIELDS = ("video_id", "channel", "status", "queued", "download", "postprocess", "total",
+              "bytes", "avg_speed", "peak_speed", "retries", "started_at", "finished_at")
+# yt-dlp prints this when it retries a fragment or an HTTP request
+RETRY_MARKER = "Retrying"
+
+class VideoMetrics:
+    """Timings and throughput of one video; times are time.time() values"""
+
+    def __init__(self, video_id, channel, queued_at):
+        self.video_id = video_id
+        self.channel = channel
+        self.status = "queued"
+        self.queued_at = queued_at
+        self.started_at = None
+        self.last_stream_at = None
+        self.finished_at = None
+        self.retries = 0
+        self.peak_speed = 0.0
+        # Bytes of the finished streams plus the stream that is downloading
+        self.stream_bytes = 0
+        self.current_bytes = 0
+
+    @property
+    def bytes(self):
+        return self.stream_bytes + self.current_bytes
+
+    def phases(self, now=None):
+        """Return the seconds spent in each phase so far"""
+        now = now or time.time()
+        end = self.finished_at or now
+        started = self.started_at or end
+        # Merging and moving start once the last stream is on disk
+        download_end = self.last_stream_at if self.finished_at and self.last_stream_at else end
+        return {
+            "queued": started - self.queued_at,
+            "download": max(download_end - started, 0.0) if self.started_at else 0.0,
+            "postprocess": max(end - download_end, 0.0) if self.started_at else 0.0,
+        }
+
+    def to_dict(self, now=None):
+        phases = self.phases(now)
+        download = phases["download"]
+        return {
+            "video_id": self.video_id,
+            "channel": self.channel,
+            "status": self.status,
+            "queued": round(phases["queued"], 3),
+            "download": round(download, 3),
+            "postprocess": round(phases["postprocess"], 3),
+            "total": round(sum(phases.values()), 3),
+            "bytes": self.bytes,
+            "avg_speed": round(self.bytes / download, 1) if download > 0 else None,
+            "peak_speed": round(self.peak_speed, 1),
+            "retries": self.retries,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class RunMetrics:
+    """Thread-safe collector fed by the download engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.videos = {}
+        # channel URL -> seconds the last listing took
+        self.listings = {}
+        self.created_at = time.time()
+        # Session totals for the Prometheus counters; rows are replaced when a video is queued again,
+        # so summing them could go down
+        self.downloaded_bytes = 0
+        self.retries = 0
+
+    def record_listing(self, channel, seconds):
+        with self._lock:
+            self.listings[channel] = seconds
+
+    def queued(self, channel, video_ids):
+        now = time.time()
+        with self._lock:
+            for video_id in video_ids:
+                previous = self.videos.pop(video_id, None)
+                video = self.videos[video_id] = VideoMetrics(video_id, channel, now)
+                if previous and previous.status == "failed":
+                    # Queued again by a later sync in the same session
+                    video.retries = previous.retries + 1
+                    self.retries += 1
+
+    def started(self, video_id):
+        with self._lock:
+            video = self.videos.get(video_id)
+            if video:
+                video.status = "running"
+                video.started_at = time.time()
+
+    def requeued(self, video_id):
+        """A failed download went back into the queue for another try"""
+        with self._lock:
+            video = self.videos.get(video_id)
+            if video:
+                video.status = "queued"
+                video.retries += 1
+                video.current_bytes = 0
+                self.retries += 1
+
+    def progress(self, event):
+        """Apply a ProgressEvent"""
+        with self._lock:
+            video = self.videos.get(event.video_id)
+            if not video:
+                return
+            if event.status == "finished":
+                size = event.total_bytes or event.downloaded_bytes or 0
+                self.downloaded_bytes += max(size - (video.current_bytes or 0), 0)
+                video.stream_bytes += size
+                video.current_bytes = 0
+                video.last_stream_at = time.time()
+            else:
+                self.downloaded_bytes += max((event.downloaded_bytes or 0) - (video.current_bytes or 0), 0)
+                video.current_bytes = event.downloaded_bytes
+            if event.speed:
+                video.peak_speed = max(video.peak_speed, event.speed)
+
+    def output(self, video_id, line):
+        """Look at a line of yt-dlp output for retries"""
+        if RETRY_MARKER not in line:
+            return
+        with self._lock:
+            video = self.videos.get(video_id)
+            if video:
+                video.retries += 1
+                self.retries += 1
+
+    def finished(self, video_id, status):
+        """status is "done", "failed" or "interrupted" """
+        with self._lock:
+            video = self.videos.get(video_id)
+            if video:
+                video.status = status
+                video.finished_at = time.time()
+
+    def rows(self):
+        """Return one dict per video, in the order they were queued"""
+        now = time.time()
+        with self._lock:
+            return [video.to_dict(now) for video in self.videos.values()]
+
+    def summary(self):
+        rows = self.rows()
+        with self._lock:
+            listings = dict(self.listings)
+        counts = {}
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        download_time = sum(row["download"] for row in rows)
+        total_bytes = sum(row["bytes"] for row in rows)
+        return {
+            "videos": len(rows),
+            "status": counts,
+            "bytes": total_bytes,
+            "retries": sum(row["retries"] for row in rows),
+            "phase_seconds": {phase: round(sum(row[phase] for row in rows), 3) for phase in PHASES},
+            "avg_speed": round(total_bytes / download_time, 1) if download_time else None,
+            "peak_speed": max((row["peak_speed"] for row in rows), default=0.0),
+            "listing_seconds": {channel: round(seconds, 3) for channel, seconds in listings.items()},
+        }
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "videos": self.rows()}, f, ensure_ascii=False, indent=2)
+
+    def export_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def export(self, path):
+        """Write JSON or CSV, picked by the file extension"""
+        if path.lower().endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+    def prometheus_text(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        rows = self.rows()
+        with self._lock:
+            listings = dict(self.listings)
+            downloaded_bytes = self.downloaded_bytes
+            retries = self.retries
+
+        def label(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{label(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        counts = {}
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        metric("ytdl_videos", "gauge", "Videos of this session by status",
+               [({"status": status}, count) for status, count in sorted(counts.items())])
+        metric("ytdl_downloaded_bytes_total", "counter", "Bytes downloaded in this session",
+               [({}, downloaded_bytes)])
+        metric("ytdl_retries_total", "counter", "Retries reported by yt-dlp or queued by the engine",
+               [({}, retries)])
+        # A requeued video starts its phases over, so this can go down
+        metric("ytdl_phase_seconds", "gauge", "Seconds spent in each phase, summed over the videos of this session",
+               [({"phase": phase}, round(sum(row[phase] for row in rows), 3)) for phase in PHASES])
+        metric("ytdl_video_peak_speed_bytes", "gauge", "Highest per-video download speed seen",
+               [({}, max((row["peak_speed"] for row in rows), default=0.0))])
+        metric("ytdl_listing_seconds", "gauge", "Duration of the last channel listing",
+               [({"channel": channel}, round(seconds, 3)) for channel, seconds in sorted(listings.items())])
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves RunMetrics.prometheus_text() on http://127.0.0.1:<port>/metrics from a daemon thread"""
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        # Only needed when the endpoint is switched on
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would drown the log
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,199 @@
+"""
+Post-processing stage
+- Best-quality downloads fetch the video and audio streams as separate files, and the merge runs here
+  instead of inside yt-dlp, so a download slot is free again as soon as its bytes are on disk
+- Jobs run on a process pool sized to the CPU count: merge/remux with ffmpeg, thumbnail conversion
+  and resizing, optional SHA-256 checksum files and the content hash used for deduplication
+- The number of jobs waiting for the pool is bounded, a full queue holds back the downloads
+- Videos downloaded to a staging directory are moved into the library as the last step
+"""
+
+import os
+import re
+import shutil
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from dedup import file_digest
+from staging import move_to_library
+
+THUMBNAIL_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+# ".f<format_id>" in the name of a separately downloaded stream; YouTube format IDs are numbers,
+# some with a suffix such as 251-drc
+STREAM_SUFFIX = re.compile(r"\.f\d+(?:-\w+)?")
+# Jobs allowed to wait for a free pool process, per process
+QUEUE_PER_WORKER = 2
+
+def ffmpeg_available(ffmpeg="ffmpeg"):
+    return shutil.which(ffmpeg) is not None
+
+def stream_final_path(stream_path):
+    """Return the merged file name for a stream written as <stem>.f<format_id>.<ext>"""
+    base, ext = os.path.splitext(stream_path)
+    stem, format_suffix = os.path.splitext(base)
+    if STREAM_SUFFIX.fullmatch(format_suffix):
+        # Video and m4a audio are merged into mp4
+        return stem + ".mp4"
+    return stream_path
+
+def _run_ffmpeg(ffmpeg, args):
+    result = subprocess.run([ffmpeg, "-y", "-hide_banner", "-loglevel", "error"] + args,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip() or result.returncode}")
+
+def merge_streams(streams, final_path, ffmpeg="ffmpeg"):
+    """Mux separately downloaded streams into final_path and remove them"""
+    streams = [path for path in streams if os.path.exists(path)]
+    if not streams:
+        if os.path.exists(final_path):
+            # Merged by an earlier run that was interrupted before the index was updated
+            return final_path
+        raise FileNotFoundError(f"No downloaded streams for {final_path}")
+
+    if len(streams) == 1:
+        os.replace(streams[0], final_path)
+        return final_path
+
+    tmp_path = os.path.splitext(final_path)[0] + ".merging.mp4"
+    args = []
+    for path in streams:
+        args.extend(["-i", path])
+    # Every input keeps its streams (video from one file, audio from the other), nothing is re-encoded
+    for number in range(len(streams)):
+        args.extend(["-map", str(number)])
+    args.extend(["-c", "copy", "-movflags", "+faststart", tmp_path])
+    try:
+        _run_ffmpeg(ffmpeg, args)
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    for path in streams:
+        os.remove(path)
+    return final_path
+
+def convert_thumbnail(final_path, max_width=0, ffmpeg="ffmpeg"):
+    """Convert the thumbnail next to final_path to JPEG, scaled down to max_width (0 = keep size)"""
+    stem = os.path.splitext(final_path)[0]
+    # Not a glob on the stem, that would also match "<stem>.5.webp" of another video
+    candidates = [stem + ext for ext in THUMBNAIL_EXTENSIONS if os.path.exists(stem + ext)]
+    if not candidates:
+        return None
+    source = candidates[0]
+    target = stem + ".jpg"
+    if source == target and not max_width:
+        return target
+
+    args = ["-i", source]
+    if max_width:
+        args.extend(["-vf", f"scale='min({int(max_width)},iw)':-2"])
+    tmp_path = stem + ".thumb.tmp.jpg"
+    args.extend(["-frames:v", "1", tmp_path])
+    try:
+        _run_ffmpeg(ffmpeg, args)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if source != target:
+        os.remove(source)
+    return target
+
+def write_checksum(path, checksum=None):
+    """Write <file>.sha256 in the sha256sum format and return the digest"""
+    checksum = checksum or file_digest(path)
+    with open(path + ".sha256", "w", encoding="utf-8") as f:
+        f.write(f"{checksum}  {os.path.basename(path)}\n")
+    return checksum
+
+def run_job(job):
+    """Run one post-processing job inside a pool process and return the result dict"""
+    final_path = merge_streams(job["streams"], job["final_path"], job.get("ffmpeg", "ffmpeg"))
+    warnings = []
+    if job.get("thumbnails"):
+        try:
+            convert_thumbnail(final_path, job.get("thumbnail_width", 0), job.get("ffmpeg", "ffmpeg"))
+        except Exception as e:
+            # A bad thumbnail doesn't make the video fail
+            warnings.append(f"Thumbnail conversion failed: {e}")
+    # One pass over the file serves both the checksum file and deduplication
+    checksum = file_digest(final_path) if job.get("checksum") or job.get("digest") else None
+    if job.get("checksum"):
+        write_checksum(final_path, checksum)
+    if job.get("staging_path"):
+        final_path = move_to_library(final_path, job["staging_path"], job["library_path"])
+    return {
+        "file_path": final_path,
+        "file_size": os.path.getsize(final_path),
+        "checksum": checksum,
+        "upload_date": job.get("upload_date"),
+        "warnings": warnings,
+    }
+
+class PostProcessStage:
+    """Bounded queue in front of a CPU-sized process pool"""
+
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers or os.cpu_count() or 2
+        self.queue_size = queue_size or self.workers * QUEUE_PER_WORKER
+        # Forking a process with Tk and worker threads isn't safe
+        self._context = multiprocessing.get_context("spawn")
+        self._pool = None
+        # Pools shut down without waiting, their running jobs may still be recording results
+        self._retired = []
+        self._lock = threading.Lock()
+        # Free places in the pool plus its waiting queue
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._pending = 0
+
+    def submit(self, job, stop_event=None):
+        """Queue a job and return its Future; blocks while the queue is full
+
+        Returns None if stop_event was set while waiting.
+        """
+        while not self._slots.acquire(timeout=0.5):
+            if stop_event is not None and stop_event.is_set():
+                return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+            self._pending += 1
+            try:
+                future = self._pool.submit(run_job, job)
+            except Exception:
+                self._pending -= 1
+                self._slots.release()
+                raise
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def depths(self):
+        """Return (queued, running) job counts for display"""
+        with self._lock:
+            pending = self._pending
+        running = min(pending, self.workers)
+        return pending - running, running
+
+    def shutdown(self, wait=False):
+        """Drop queued jobs; running merges finish in the background unless wait is set
+
+        With wait, also waits for the jobs of pools that an earlier shutdown() left running.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+            if pool is not None:
+                self._retired.append(pool)
+            if wait:
+                pools, self._retired = self._retired, []
+            else:
+                pools = [pool] if pool is not None else []
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
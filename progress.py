@@ -0,0 +1,153 @@
+"""
+Download progress
+- yt-dlp is driven with a JSON progress template, one event per line
+- Lines are parsed into typed ProgressEvent records
+- ProgressTracker aggregates events from every worker into channel-wide totals
+"""
+
+import re
+import json
+import time
+import threading
+import collections
+
+# Prefix of the lines produced by PROGRESS_TEMPLATE
+PROGRESS_MARKER = "__progress__"
+PROGRESS_TEMPLATE = (
+    "download:" + PROGRESS_MARKER + " {"
+    '"id": %(info.id)j, '
+    '"status": %(progress.status)j, '
+    '"downloaded": %(progress.downloaded_bytes)j, '
+    '"total": %(progress.total_bytes)j, '
+    '"estimate": %(progress.total_bytes_estimate)j, '
+    '"speed": %(progress.speed)j, '
+    '"eta": %(progress.eta)j'
+    "}"
+)
+# yt-dlp writes its NA placeholder instead of null for fields that are missing altogether
+_NA_VALUE = re.compile(r'(?<=: )NA(?=[,}])')
+
+ProgressEvent = collections.namedtuple(
+    "ProgressEvent",
+    ["video_id", "status", "downloaded_bytes", "total_bytes", "speed", "eta"]
+)
+
+def parse_progress_line(line):
+    """Return a ProgressEvent for a progress template line, or None for any other output"""
+    if not line.startswith(PROGRESS_MARKER):
+        return None
+    payload = line[len(PROGRESS_MARKER):].strip()
+    try:
+        data = json.loads(_NA_VALUE.sub("null", payload))
+    except ValueError:
+        return None
+
+    total = data.get("total") or data.get("estimate")
+    return ProgressEvent(
+        video_id=data.get("id"),
+        status=data.get("status") or "downloading",
+        downloaded_bytes=int(data.get("downloaded") or 0),
+        total_bytes=int(total) if total else None,
+        speed=float(data["speed"]) if data.get("speed") else None,
+        eta=int(data["eta"]) if data.get("eta") is not None else None,
+    )
+
+def format_bytes(value):
+    """Format a byte count for display"""
+    value = float(value or 0)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+def format_eta(seconds):
+    """Format a number of seconds as H:MM:SS"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ProgressTracker:
+    """Thread-safe aggregate of the progress of every video in a run"""
+
+    def __init__(self, total_videos):
+        self.total_videos = total_videos
+        self.completed = 0
+        self.failed = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        # video_id -> [bytes of finished streams, current stream bytes, current stream total, speed]
+        self._active = {}
+        self._finished_bytes = 0
+
+    def start(self, video_id):
+        """Register a video that a worker has picked up"""
+        with self._lock:
+            self._active[video_id] = [0, 0, None, None]
+
+    def update(self, event):
+        """Apply a ProgressEvent from a worker"""
+        with self._lock:
+            state = self._active.setdefault(event.video_id, [0, 0, None, None])
+            if event.status == "finished":
+                # Best quality downloads video and audio as separate streams
+                state[0] += event.total_bytes or event.downloaded_bytes
+                state[1] = 0
+                state[2] = None
+                state[3] = None
+            else:
+                state[1] = event.downloaded_bytes
+                state[2] = event.total_bytes
+                state[3] = event.speed
+
+    def finish(self, video_id, success):
+        """Mark a video as done or failed and drop it from the active set"""
+        with self._lock:
+            state = self._active.pop(video_id, None)
+            if success:
+                self.completed += 1
+                if state:
+                    self._finished_bytes += state[0] + state[1]
+            else:
+                self.failed += 1
+
+    def cancel(self, video_id):
+        """Drop a video that was interrupted without counting it as done or failed"""
+        with self._lock:
+            self._active.pop(video_id, None)
+
+    def snapshot(self):
+        """Return channel-wide counters, throughput and ETA"""
+        with self._lock:
+            finished = self.completed + self.failed
+            fractions = 0.0
+            remaining_bytes = 0
+            active_sizes = []
+            speed = 0.0
+            for done_bytes, current, total, stream_speed in self._active.values():
+                if total:
+                    fractions += (done_bytes + current) / (done_bytes + total)
+                    remaining_bytes += max(total - current, 0)
+                    active_sizes.append(done_bytes + total)
+                speed += stream_speed or 0
+            active = len(self._active)
+
+            # Videos nobody has started yet are estimated from the sizes seen so far
+            known_sizes = active_sizes + ([self._finished_bytes / self.completed] if self.completed else [])
+            average_size = sum(known_sizes) / len(known_sizes) if known_sizes else None
+            waiting = self.total_videos - finished - active
+            if average_size:
+                remaining_bytes += waiting * average_size
+
+        percent = (finished + fractions) / self.total_videos * 100 if self.total_videos else 0
+        eta = remaining_bytes / speed if speed and average_size else None
+        return {
+            "total": self.total_videos,
+            "completed": self.completed,
+            "failed": self.failed,
+            "active": active,
+            "percent": min(percent, 100.0),
+            "speed": speed,
+            "eta": eta,
+        }
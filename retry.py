@@ -0,0 +1,198 @@
+"""
+Retries
+- Failed downloads are classified from the yt-dlp error output: throttle, auth, unavailable or transient
+- Each class has its own retry limit and exponential backoff with jitter; failures that can be
+  retried go back into the channel's queue instead of waiting for the next sync
+- Throttling trips a circuit breaker that pauses every download; after the pause one download probes
+  the connection before the others follow, and repeated throttling makes the pauses longer
+"""
+
+import re
+import time
+import heapq
+import random
+import threading
+import collections
+
+FAILURE_THROTTLE = "throttle"
+FAILURE_AUTH = "auth"
+FAILURE_UNAVAILABLE = "unavailable"
+FAILURE_TRANSIENT = "transient"
+
+# Checked in this order, the first match wins; anything else is transient
+FAILURE_PATTERNS = (
+    (FAILURE_THROTTLE, re.compile(
+        r"HTTP Error 429|Too Many Requests|rate.?limit|try again later|confirm you.re not a bot", re.I)),
+    (FAILURE_AUTH, re.compile(
+        r"Sign in to confirm your age|age.restricted|members.only|Join this channel|login required|"
+        r"cookies? (?:are|is) (?:no longer valid|expired)|use --cookies", re.I)),
+    (FAILURE_UNAVAILABLE, re.compile(
+        r"Video unavailable|video is unavailable|Private video|has been removed|copyright|"
+        r"not available in your country|account .* terminated|Premieres in|live event will begin", re.I)),
+)
+
+# error class -> (retries within one sync, first delay, longest delay) in seconds
+RETRY_POLICIES = {
+    FAILURE_THROTTLE: (4, 60.0, 900.0),
+    FAILURE_TRANSIENT: (3, 5.0, 120.0),
+    # Neither gets better by waiting: unavailable videos are not tried again, ones that need a login after the next login
+    FAILURE_AUTH: (0, 0.0, 0.0),
+    FAILURE_UNAVAILABLE: (0, 0.0, 0.0),
+}
+# Pause of all downloads after the first throttle error, doubled on every repeat up to the maximum
+BREAKER_PAUSE = 60.0
+BREAKER_MAX_PAUSE = 1800.0
+# yt-dlp lines kept per download for classifying a failure
+ERROR_LINES = 20
+
+def classify_failure(lines):
+    """Return the error class of a failed download from its yt-dlp output"""
+    text = "\n".join(lines)
+    for kind, pattern in FAILURE_PATTERNS:
+        if pattern.search(text):
+            return kind
+    return FAILURE_TRANSIENT
+
+def backoff_delay(kind, attempt):
+    """Seconds to wait before retry number `attempt` (1-based), with equal jitter"""
+    _, base, cap = RETRY_POLICIES[kind]
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class FailureLog:
+    """Keeps the last error and warning lines of a download for classify_failure"""
+
+    def __init__(self):
+        self.lines = collections.deque(maxlen=ERROR_LINES)
+
+    def feed(self, line):
+        if line.startswith(("ERROR", "WARNING")) or "HTTP Error" in line:
+            self.lines.append(line)
+
+    def classify(self):
+        return classify_failure(self.lines)
+
+class CircuitBreaker:
+    """Stops new downloads while YouTube is throttling
+
+    closed: downloads start freely. open: nobody starts until the pause is over.
+    half-open: one download probes; success closes the breaker, throttling opens it for longer.
+    """
+
+    def __init__(self, pause=BREAKER_PAUSE, max_pause=BREAKER_MAX_PAUSE, log=None):
+        self.pause = pause
+        self.max_pause = max_pause
+        self.log = log or (lambda message, level="info": None)
+        self._cond = threading.Condition()
+        self._open_until = 0.0
+        self._trips = 0
+        self._probing = False
+
+    def wait(self, stop_event=None):
+        """Block while the breaker is open; returns False if stop_event was set while waiting"""
+        with self._cond:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                remaining = self._open_until - time.time()
+                if remaining > 0:
+                    self._cond.wait(min(remaining, 0.5))
+                    continue
+                if not self._trips:
+                    return True
+                if not self._probing:
+                    # Half-open: this download finds out whether the throttling is over
+                    self._probing = True
+                    return True
+                self._cond.wait(0.5)
+
+    def throttled(self):
+        """Open the breaker after a throttle error, for longer on every repeat"""
+        with self._cond:
+            if time.time() < self._open_until:
+                # Downloads that were already running when it tripped
+                return
+            pause = min(self.pause * 2 ** self._trips, self.max_pause)
+            self._trips += 1
+            self._probing = False
+            self._open_until = time.time() + pause
+            self._cond.notify_all()
+        self.log(f"Throttled by YouTube, pausing all downloads for {int(pause)} s", "warning")
+
+    def succeeded(self):
+        """Close the breaker once a download went through"""
+        with self._cond:
+            if self._trips and time.time() >= self._open_until:
+                self._trips = 0
+                self._probing = False
+                self._cond.notify_all()
+                closed = True
+            else:
+                closed = False
+        if closed:
+            self.log("Downloads are going through again, resuming")
+
+    def release_probe(self):
+        """The probing download ended without telling either way (stopped, other error)"""
+        with self._cond:
+            self._probing = False
+            self._cond.notify_all()
+
+    def paused_for(self):
+        """Seconds until downloads may start again, 0 when closed"""
+        with self._cond:
+            return max(self._open_until - time.time(), 0.0)
+
+class RetryQueue:
+    """Video IDs of one sync, including failed ones waiting out their backoff"""
+
+    def __init__(self, video_ids):
+        self._cond = threading.Condition()
+        self._ready = collections.deque(video_ids)
+        # (due time, order, video_id)
+        self._delayed = []
+        self._order = 0
+        self._in_flight = 0
+        # video_id -> {error class: retries so far}
+        self._attempts = collections.defaultdict(collections.Counter)
+
+    def get(self, stop_event=None):
+        """Return the next video to download, or None when the sync has nothing left
+
+        Waits while downloads that may still fail and come back are running.
+        """
+        with self._cond:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                now = time.time()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[2])
+                if self._ready:
+                    self._in_flight += 1
+                    return self._ready.popleft()
+                if not self._delayed and not self._in_flight:
+                    return None
+                timeout = self._delayed[0][0] - now if self._delayed else 0.5
+                self._cond.wait(min(timeout, 0.5))
+
+    def done(self, video_id):
+        """A download ended for good, done or failed"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def retry(self, video_id, kind):
+        """Queue a failed video again after its backoff; returns the delay, or None if out of retries"""
+        max_retries = RETRY_POLICIES[kind][0]
+        with self._cond:
+            attempt = self._attempts[video_id][kind] + 1
+            if attempt > max_retries:
+                return None
+            self._attempts[video_id][kind] = attempt
+            delay = backoff_delay(kind, attempt)
+            self._order += 1
+            heapq.heappush(self._delayed, (time.time() + delay, self._order, video_id))
+            self._in_flight -= 1
+            self._cond.notify_all()
+        return delay
@@ -0,0 +1,92 @@
+"""
+Staging directory
+- Downloads, .part files and merges go to a fast local scratch directory instead of the library,
+  which may be slow network storage
+- Finished videos and their side files are moved into the library atomically: a copy to a hidden
+  temporary name on the library's file system, then a rename, so the library never shows half a file
+- Free space is checked before a sync and before every download (2 GiB by default in staging mode)
+"""
+
+import os
+import re
+import glob
+import errno
+import shutil
+
+from progress import format_bytes
+
+# Free space a staging directory or library must keep, a download doesn't start below it
+MIN_FREE_SPACE = 2 * 1024 ** 3
+# Side files yt-dlp writes next to a video, after its stem
+SIDE_SUFFIXES = (".info.json", ".description")
+# <stem>.<lang>.<ext>; language codes have no dots, so "<stem>.5.en.vtt" belongs to another video
+SUBTITLE_SUFFIX = re.compile(r"\.[A-Za-z][\w-]*\.(?:vtt|srt|ass|ttml|srv[123]|json3)")
+# Files of a download or merge that is still running
+TEMPORARY_SUFFIXES = (".part", ".ytdl", ".temp", ".merging.mp4")
+
+def free_space(path):
+    """Free bytes on the file system of path (or of its nearest existing parent)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return shutil.disk_usage(path).free
+
+def check_free_space(path, needed=MIN_FREE_SPACE):
+    """Raise OSError if path has less than `needed` bytes free"""
+    free = free_space(path)
+    if free < needed:
+        raise OSError(f"Only {format_bytes(free)} free in {path}, at least {format_bytes(needed)} are needed")
+    return free
+
+def move_file(source, target):
+    """Move source to target so that target appears complete or not at all"""
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    try:
+        os.replace(source, target)
+        return target
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # Different file systems: copy next to the target, then rename
+    tmp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.staging")
+    try:
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    os.remove(source)
+    return target
+
+def side_files(file_path):
+    """Return the side files of a video: info JSON, description, thumbnail, subtitles and checksum"""
+    # Imported here, postprocess imports this module
+    from postprocess import THUMBNAIL_EXTENSIONS
+
+    stem = os.path.splitext(file_path)[0]
+    candidates = [stem + suffix for suffix in SIDE_SUFFIXES + THUMBNAIL_EXTENSIONS]
+    candidates.append(file_path + ".sha256")
+    # Subtitles are the only side files with a variable part, anything else that shares the stem
+    # may be another video whose title starts with this one
+    candidates.extend(path for path in glob.glob(glob.escape(stem) + ".*")
+                      if SUBTITLE_SUFFIX.fullmatch(path[len(stem):]))
+    return [path for path in candidates if not path.endswith(TEMPORARY_SUFFIXES) and os.path.exists(path)]
+
+def move_to_library(file_path, staging_path, library_path):
+    """Move a finished video and its side files from the staging directory into the library
+
+    The layout below the staging directory is kept. Side files go first, so the video never
+    appears in the library without its .info.json. Returns the video's path in the library.
+    """
+    relative = os.path.relpath(file_path, staging_path)
+    if relative.startswith(os.pardir):
+        # Already outside the staging directory
+        return file_path
+    target = os.path.join(library_path, relative)
+    for path in side_files(file_path):
+        move_file(path, os.path.join(library_path, os.path.relpath(path, staging_path)))
+    move_file(file_path, target)
+    return target